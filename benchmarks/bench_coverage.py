@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""Compares sliced `Jellyfish.query` calls against `Jellyfish.coverage`.
+
+Usage: python benchmarks/bench_coverage.py db.jf [-l 1000000]
+"""
+
+import argparse
+import random
+
+from bench_query_many import best_of
+from pyjellyfish import Jellyfish
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('jf', help='jellyfish database')
+    parser.add_argument('-l', '--length', type=int, default=1000000,
+                        help='length of the random contig')
+    parser.add_argument('-r', '--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    db = Jellyfish(args.jf)
+    seq = ''.join(random.Random(0).choices('ACGT', k=args.length))
+
+    def sliced():
+        return [db.query(seq[i:i + db.k]) for i in range(len(seq) - db.k + 1)]
+
+    timings = [
+        ('sliced query', best_of(args.repeat, sliced)),
+        ('coverage', best_of(args.repeat, db.coverage, seq)),
+    ]
+
+    baseline = timings[0][1]
+    for name, elapsed in timings:
+        print('%-20s %8.3fs %12.0f bp/s  x%.2f' % (
+            name, elapsed, args.length / elapsed, baseline / elapsed))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""Compares string-based and Kmer-based `get_child` on a k=31 database.
+
+Usage: python benchmarks/bench_kmer.py db31.jf [-n 100000]
+"""
+
+import argparse
+
+import dna_jellyfish as jellyfish
+from bench_query_many import best_of, random_kmers
+from pyjellyfish import Jellyfish
+from pyjellyfish.Kmer import Kmer
+
+
+def legacy_get_child(db, seq, forward=True):
+    """get_child as implemented before the Kmer fast path."""
+    child = []
+    sum = 0
+    for c in ['A', 'C', 'G', 'T']:
+        if forward:
+            c_seq = seq[1:] + c
+        else:
+            c_seq = c + seq[0:-1]
+        kmer = jellyfish.MerDNA(c_seq)
+        if db.canonical:
+            kmer.canonicalize()
+        c_count = db.jf[kmer]
+        child.append((c_seq, c_count))
+        sum += c_count
+    threshold = max(sum * db.cutoff, db.n_cutoff)
+
+    return [x[0] for x in [x for x in child if x[1] >= threshold]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('jf', help='jellyfish database built with k=31')
+    parser.add_argument('-n', type=int, default=100000, help='number of k-mers')
+    parser.add_argument('-r', '--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    db = Jellyfish(args.jf, n_cutoff=0)
+    if db.k != 31:
+        parser.error('expected a k=31 database, got k=%d' % db.k)
+    kmers = random_kmers(db.k, args.n)
+    packed = [Kmer.from_str(s) for s in kmers]
+
+    timings = [
+        ('legacy get_child', best_of(
+            args.repeat, lambda: [legacy_get_child(db, s) for s in kmers])),
+        ('get_child(str)', best_of(
+            args.repeat, lambda: [db.get_child(s) for s in kmers])),
+        ('get_child(Kmer)', best_of(
+            args.repeat, lambda: [db.get_child(m) for m in packed])),
+        ('string shift-in', best_of(
+            args.repeat, lambda: [jellyfish.MerDNA(s[1:] + 'A').canonicalize()
+                                  for s in kmers])),
+        ('Kmer shift-in', best_of(
+            args.repeat, lambda: [m.shift_left(0).canonical for m in packed])),
+    ]
+
+    baseline = timings[0][1]
+    for name, elapsed in timings:
+        print('%-20s %8.3fs %12.0f k-mers/s  x%.2f' % (
+            name, elapsed, args.n / elapsed, baseline / elapsed))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""Compares the query throughput of pyjellyfish installations built with
+different optimization profiles.
+
+Each installation is given as the python interpreter of the environment
+it is installed in, e.g. one virtualenv per `--jf-profile`:
+
+Usage: python benchmarks/bench_profiles.py db.jf venv-O3/bin/python \
+           venv-native/bin/python [-n 1000000]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+
+RUN = '''
+import json, sys
+sys.path.insert(0, %(benchmarks)r)
+import pyjellyfish
+from pyjellyfish import Jellyfish
+from bench_query_many import best_of, random_kmers
+
+db = Jellyfish(%(jf)r).preload()
+kmers = random_kmers(db.k, %(n)d)
+info = pyjellyfish.build_info() or {'profile': 'unknown'}
+print(json.dumps({
+    'profile': info['profile'],
+    'query': best_of(%(repeat)d, lambda: [db.query(s) for s in kmers]),
+    'query_many': best_of(%(repeat)d, db.query_many, kmers),
+}))
+'''
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('jf', help='jellyfish database')
+    parser.add_argument('pythons', nargs='+',
+                        help='interpreters of the installations to compare')
+    parser.add_argument('-n', type=int, default=1000000, help='number of k-mers')
+    parser.add_argument('-r', '--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    code = RUN % {
+        'benchmarks': BENCHMARKS, 'jf': os.path.abspath(args.jf),
+        'n': args.n, 'repeat': args.repeat
+    }
+    # run outside of the source tree, so that the installed package is
+    # the one imported
+    results = [
+        json.loads(subprocess.check_output([python, '-c', code], cwd='/'))
+        for python in args.pythons
+    ]
+
+    baseline = results[0]['query_many']
+    for python, result in zip(args.pythons, results):
+        print('%-12s %-30s %12.0f query/s %12.0f query_many/s  x%.2f' % (
+            result['profile'], python, args.n / result['query'],
+            args.n / result['query_many'], baseline / result['query_many']))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""Compares `Jellyfish.query` in a loop against `Jellyfish.query_many`.
+
+Usage: python benchmarks/bench_query_many.py db.jf [-n 1000000]
+"""
+
+import argparse
+import random
+import time
+
+from pyjellyfish import Jellyfish
+
+
+def random_kmers(k, n, seed=0):
+    rng = random.Random(seed)
+    return [''.join(rng.choices('ACGT', k=k)) for _ in range(n)]
+
+
+def best_of(repeat, func, *args):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('jf', help='jellyfish database')
+    parser.add_argument('-n', type=int, default=1000000, help='number of k-mers')
+    parser.add_argument('-r', '--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    db = Jellyfish(args.jf)
+    kmers = random_kmers(db.k, args.n)
+    packed = ''.join(kmers).encode('ascii')
+
+    timings = [
+        ('query loop', best_of(args.repeat, lambda: [db.query(s) for s in kmers])),
+        ('query_many(list)', best_of(args.repeat, db.query_many, kmers)),
+        ('query_many(bytes)', best_of(args.repeat, db.query_many, packed)),
+    ]
+
+    baseline = timings[0][1]
+    for name, elapsed in timings:
+        print('%-20s %8.3fs %12.0f k-mers/s  x%.2f' % (
+            name, elapsed, args.n / elapsed, baseline / elapsed))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""Measures the startup costs of pyjellyfish, each in a fresh interpreter:
+importing the package, opening a database and its first lookup.
+
+Usage: python benchmarks/bench_startup.py db.jf [-r 5]
+"""
+
+import argparse
+import subprocess
+import sys
+import time
+
+
+STEPS = [
+    ('python', 'pass'),
+    ('import pyjellyfish', 'import pyjellyfish'),
+    ('import Jellyfish', 'from pyjellyfish import Jellyfish'),
+    ('open (header only)',
+     'from pyjellyfish import Jellyfish; Jellyfish({jf!r}).k'),
+    ('open + preload',
+     'from pyjellyfish import Jellyfish; Jellyfish({jf!r}).preload()'),
+    ('open + first query',
+     'from pyjellyfish import Jellyfish; db = Jellyfish({jf!r}); '
+     'db.query("A" * db.k)'),
+]
+
+
+def best_run(repeat, code):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-c', code], check=True)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('jf', help='jellyfish database')
+    parser.add_argument('-r', '--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    baseline = None
+    for name, code in STEPS:
+        elapsed = best_run(args.repeat, code.format(jf=args.jf))
+        if baseline is None:
+            baseline = elapsed
+        print('%-20s %8.1fms  +%.1fms over python' % (
+            name, elapsed * 1000, (elapsed - baseline) * 1000))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""Measures query throughput from 1 to N threads sharing one Jellyfish,
+next to `Jellyfish.parallel_query` with as many processes.
+
+The "cached" column queries through an LRU count cache, which adds the
+locking and Kmer packing of the cache to each lookup.
+
+Usage: python benchmarks/bench_threads.py db.jf [-n 1000000] [-t 8]
+"""
+
+import argparse
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from bench_query_many import best_of, random_kmers
+from pyjellyfish import Jellyfish
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('jf', help='jellyfish database')
+    parser.add_argument('-n', type=int, default=1000000, help='number of k-mers')
+    parser.add_argument('-t', '--threads', type=int, default=os.cpu_count(),
+                        help='maximum number of threads and processes')
+    parser.add_argument('-r', '--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    db = Jellyfish(args.jf)
+    cached = Jellyfish(args.jf, cache_size=100000)
+    kmers = random_kmers(db.k, args.n)
+
+    def threaded_query(n, db=db):
+        chunks = [kmers[i::n] for i in range(n)]
+        with ThreadPoolExecutor(n) as pool:
+            list(pool.map(lambda chunk: [db.query(s) for s in chunk], chunks))
+
+    def threaded_query_many(n):
+        chunks = [kmers[i::n] for i in range(n)]
+        with ThreadPoolExecutor(n) as pool:
+            list(pool.map(db.query_many, chunks))
+
+    print('%-8s %16s %16s %16s %16s' % (
+        'workers', 'query/thread', 'cached/thread', 'query_many/thread',
+        'parallel_query'))
+    n = 1
+    while n <= args.threads:
+        row = [
+            best_of(args.repeat, threaded_query, n),
+            best_of(args.repeat, threaded_query, n, cached),
+            best_of(args.repeat, threaded_query_many, n),
+            best_of(args.repeat, db.parallel_query, kmers, n),
+        ]
+        print('%-8d %s' % (n, ' '.join(
+            '%14.0f/s' % (args.n / elapsed) for elapsed in row)))
+        n *= 2
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""Benchmark suite timing pyjellyfish on synthetic databases.
+
+Databases are generated once with `jellyfish count` from random genomes
+sequenced at a fixed depth and kept in the data directory. Results are
+saved as JSON together with the jellyfish build they were measured on,
+so that runs against different builds (e.g. jellyfish 2.2.10 and 2.3.0)
+can be compared.
+
+Usage: python benchmarks/suite.py run [-o results.json] [--sizes small]
+       python benchmarks/suite.py compare base.json new.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from bench_query_many import best_of, random_kmers
+import pyjellyfish
+from pyjellyfish import Jellyfish
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+
+# genome length of each database size; reads cover it DEPTH times
+SIZES = {'small': 100000, 'medium': 1000000, 'large': 10000000}
+KS = [21, 31]
+DEPTH = 10
+READ_LEN = 100
+
+CUTOFFS = [(0.30, 500), (0.30, 0), (0.10, 2)]
+
+
+def find_jellyfish():
+    bundled = os.path.join(BENCHMARKS, os.pardir, 'bin', 'jellyfish')
+    if os.path.isfile(bundled):
+        return os.path.abspath(bundled)
+    return shutil.which('jellyfish')
+
+
+def random_genome(length, seed):
+    rng = np.random.default_rng(seed)
+    return np.frombuffer(b'ACGT', dtype=np.uint8)[
+        rng.integers(0, 4, length)
+    ].tobytes().decode()
+
+
+def write_reads(path, genome, seed):
+    """Writes reads sampled uniformly from `genome` at `DEPTH` coverage."""
+    rng = np.random.default_rng(seed)
+    n = len(genome) * DEPTH // READ_LEN
+    starts = rng.integers(0, len(genome) - READ_LEN, n)
+    with open(path, 'w') as fh:
+        for i, start in enumerate(starts.tolist()):
+            fh.write('>r%d\n%s\n' % (i, genome[start:start + READ_LEN]))
+
+
+def make_database(jellyfish, data_dir, size, k, threads):
+    """Returns the paths of a synthetic database and of its genome,
+    generating them if needed."""
+    name = '%s_k%d' % (size, k)
+    jf = os.path.join(data_dir, name + '.jf')
+    genome_path = os.path.join(data_dir, size + '.txt')
+    if not os.path.exists(genome_path):
+        with open(genome_path, 'w') as fh:
+            fh.write(random_genome(SIZES[size], seed=SIZES[size]))
+    if not os.path.exists(jf):
+        with open(genome_path) as fh:
+            genome = fh.read()
+        reads = os.path.join(data_dir, size + '.fa')
+        write_reads(reads, genome, seed=k)
+        subprocess.run([
+            jellyfish, 'count', '-m', str(k), '-s', str(2 * SIZES[size]),
+            '-C', '-t', str(threads), '-o', jf + '.tmp', reads
+        ], check=True)
+        os.rename(jf + '.tmp', jf)
+        os.remove(reads)
+    return jf, genome_path
+
+
+def cases(jf, genome, n, max_len):
+    """Yields (name, params, function, operations) for one database."""
+    db = Jellyfish(jf).preload()
+    k = db.k
+    rng = np.random.default_rng(0)
+    starts = rng.integers(0, len(genome) - k, n).tolist()
+    present = [genome[i:i + k] for i in starts]
+    absent = random_kmers(k, n)
+    seeds = present[:100]
+
+    yield 'open', {}, lambda: Jellyfish(jf), 1
+    yield 'open+preload', {}, lambda: Jellyfish(jf).preload(), 1
+    for label, kmers in [('present', present), ('random', absent)]:
+        yield ('query', {'kmers': label},
+               lambda kmers=kmers: [db.query(s) for s in kmers], n)
+        yield ('query_many', {'kmers': label},
+               lambda kmers=kmers: db.query_many(kmers), n)
+    yield 'coverage', {}, lambda: db.coverage(genome[:n]), n
+    for cutoff, n_cutoff in CUTOFFS:
+        params = {'cutoff': cutoff, 'n_cutoff': n_cutoff}
+        walker = Jellyfish(jf, cutoff, n_cutoff).preload()
+        few = present[:n // 10]
+        yield ('get_child', params,
+               lambda walker=walker, few=few:
+               [walker.get_child(s) for s in few], len(few))
+        yield ('extend', params,
+               lambda walker=walker:
+               [walker.extend(s, max_len=max_len) for s in seeds],
+               len(seeds))
+        yield ('explore', params,
+               lambda walker=walker:
+               walker.explore(seeds[:10], max_nodes=10 * max_len),
+               10)
+    yield 'histogram', {}, lambda: db.histogram(), 1
+    yield 'stats', {}, lambda: db.stats(), 1
+
+
+def run(args):
+    jellyfish = args.jellyfish or find_jellyfish()
+    if jellyfish is None:
+        sys.exit('cannot find jellyfish; build the package or use '
+                 '--jellyfish')
+    os.makedirs(args.data_dir, exist_ok=True)
+    results = []
+    for size in args.sizes:
+        for k in args.ks:
+            jf, genome_path = make_database(
+                jellyfish, args.data_dir, size, k, args.threads
+            )
+            with open(genome_path) as fh:
+                genome = fh.read()
+            for name, params, func, ops in cases(
+                    jf, genome, args.n, args.max_len):
+                elapsed = best_of(args.repeat, func)
+                results.append({
+                    'name': name,
+                    'database': os.path.basename(jf),
+                    'size': size,
+                    'k': k,
+                    'params': params,
+                    'seconds': elapsed,
+                    'ops': ops,
+                    'ops_per_s': ops / elapsed,
+                })
+                print('%-12s %-14s %-36s %10.4fs %14.0f ops/s' % (
+                    name, os.path.basename(jf), json.dumps(params),
+                    elapsed, ops / elapsed), flush=True)
+
+    jellyfish_version = subprocess.run(
+        [jellyfish, '--version'], capture_output=True, text=True
+    ).stdout.strip()
+    report = {
+        'pyjellyfish': pyjellyfish.__version__,
+        'build_info': pyjellyfish.build_info(),
+        'jellyfish': jellyfish_version,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+        'date': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'args': {'n': args.n, 'repeat': args.repeat, 'max_len': args.max_len},
+        'results': results,
+    }
+    with open(args.output, 'w') as fh:
+        json.dump(report, fh, indent=2)
+    print('results saved to %s' % args.output)
+
+
+def compare(args):
+    with open(args.base) as fh:
+        base = json.load(fh)
+    with open(args.new) as fh:
+        new = json.load(fh)
+
+    def key(result):
+        return (result['name'], result['database'],
+                json.dumps(result['params'], sort_keys=True))
+
+    base_results = {key(r): r for r in base['results']}
+    print('base: %s\nnew:  %s' % (base['jellyfish'], new['jellyfish']))
+    for result in new['results']:
+        old = base_results.get(key(result))
+        if old is None:
+            continue
+        ratio = old['seconds'] / result['seconds']
+        flag = ''
+        if ratio < 1 - args.threshold:
+            flag = '  slower'
+        elif ratio > 1 + args.threshold:
+            flag = '  faster'
+        print('%-12s %-14s %-36s %10.4fs %10.4fs  x%.2f%s' % (
+            result['name'], result['database'], key(result)[2],
+            old['seconds'], result['seconds'], ratio, flag))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help='run the suite')
+    run_parser.add_argument('-o', '--output', default='results.json',
+                            help='JSON file of the results')
+    run_parser.add_argument('--data-dir',
+                            default=os.path.join(BENCHMARKS, 'data'),
+                            help='directory of the synthetic databases')
+    run_parser.add_argument('--jellyfish',
+                            help='jellyfish executable (default: bin/jellyfish)')
+    run_parser.add_argument('--sizes', nargs='+', choices=list(SIZES),
+                            default=['small', 'medium'])
+    run_parser.add_argument('--ks', nargs='+', type=int, default=KS)
+    run_parser.add_argument('-n', type=int, default=100000,
+                            help='number of k-mers per lookup case')
+    run_parser.add_argument('--max-len', type=int, default=1000,
+                            help='max_len of the walks')
+    run_parser.add_argument('-r', '--repeat', type=int, default=3)
+    run_parser.add_argument('-t', '--threads', type=int,
+                            default=os.cpu_count(),
+                            help='threads of jellyfish count')
+    run_parser.set_defaults(func=run)
+
+    compare_parser = commands.add_parser(
+        'compare', help='compare the results of two runs'
+    )
+    compare_parser.add_argument('base')
+    compare_parser.add_argument('new')
+    compare_parser.add_argument('--threshold', type=float, default=0.05,
+                                help='relative change flagged (default: 0.05)')
+    compare_parser.set_defaults(func=compare)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -2,6 +2,7 @@
 
 rm -f _dna_jellyfish.*.so dna_jellyfish.py 
 rm -fr build/ pyjellyfish.egg-info/
+rm -f pyjellyfish/_build.py
 rm -fr jf/bin jf/build jf/include jf/lib jf/share
 rm -fr bin/
 rm -fr __pycache__/
@@ -0,0 +1,146 @@
+import math
+import numpy as np
+import dna_jellyfish as jellyfish
+from pyjellyfish.kmers import MAX_K, canonicalize
+from pyjellyfish.RawMerFile import RawMerFile, read_chunks
+from pyjellyfish.sidecar import open_sidecar
+
+
+MASK64 = (1 << 64) - 1
+CHUNK_SIZE = 1 << 20
+
+
+def _mix64(x):
+    """splitmix64 finalizer on a python int."""
+    x = ((x ^ (x >> 30)) * 0xbf58476d1ce4e5b9) & MASK64
+    x = ((x ^ (x >> 27)) * 0x94d049bb133111eb) & MASK64
+    return x ^ (x >> 31)
+
+
+def _mix64_array(x):
+    """splitmix64 finalizer on a uint64 numpy array."""
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xbf58476d1ce4e5b9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94d049bb133111eb)
+    return x ^ (x >> np.uint64(31))
+
+
+class BloomFilter:
+    """Bloom filter over the 2-bit integer codes of the k-mers of a
+    database, used to skip the hash lookup of absent k-mers."""
+
+    def __init__(self, nbits, nhashes, bits=None):
+        self.nbits = nbits
+        self.nhashes = nhashes
+        if bits is None:
+            bits = np.zeros((nbits + 7) // 8, dtype=np.uint8)
+        self.bits = bits
+
+    @classmethod
+    def sized(cls, n, fpr):
+        """Returns an empty filter for `n` k-mers at false-positive rate
+        `fpr`."""
+        n = max(n, 1)
+        nbits = max(int(math.ceil(-n * math.log(fpr) / math.log(2) ** 2)), 8)
+        nhashes = max(int(round(nbits / n * math.log(2))), 1)
+        return cls(nbits, nhashes)
+
+    def _positions(self, codes):
+        h1 = _mix64_array(codes)
+        h2 = _mix64_array(codes ^ np.uint64(0x9e3779b97f4a7c15)) | np.uint64(1)
+        nbits = np.uint64(self.nbits)
+        for i in range(self.nhashes):
+            yield (h1 + np.uint64(i) * h2) % nbits
+
+    def add_many(self, codes):
+        codes = np.asarray(codes, dtype=np.uint64)
+        for pos in self._positions(codes):
+            np.bitwise_or.at(
+                self.bits,
+                pos >> np.uint64(3),
+                np.left_shift(1, pos & np.uint64(7)).astype(np.uint8)
+            )
+
+    def contains_many(self, codes):
+        """Returns a boolean array, False for codes certainly absent."""
+        codes = np.asarray(codes, dtype=np.uint64)
+        found = np.ones(len(codes), dtype=bool)
+        for pos in self._positions(codes):
+            found &= (
+                (self.bits[pos >> np.uint64(3)] >> (pos & np.uint64(7))) & 1
+            ).astype(bool)
+        return found
+
+    def __contains__(self, code):
+        h1 = _mix64(code)
+        h2 = _mix64(code ^ 0x9e3779b97f4a7c15) | 1
+        bits = self.bits
+        for i in range(self.nhashes):
+            pos = ((h1 + i * h2) & MASK64) % self.nbits
+            if not (bits[pos >> 3] >> (pos & 7)) & 1:
+                return False
+        return True
+
+    @classmethod
+    def build(cls, filename, fpr=0.01, canonical=True):
+        """Returns a filter of all the k-mers of a database.
+
+        Binary databases are memory-mapped in chunks with RawMerFile and
+        other formats read with ReadMerFile."""
+        if RawMerFile.is_binary(filename):
+            raw = RawMerFile(filename)
+            k = raw.k
+            n = len(raw)
+            chunks = (
+                raw.codes(start, stop)
+                for start, stop in raw.ranges(1, CHUNK_SIZE)
+            )
+        else:
+            n = sum(
+                len(counts) for kmers, counts
+                in read_chunks(filename, CHUNK_SIZE, encode=False)
+            )
+            k = jellyfish.MerDNA.k()
+            chunks = (
+                codes for codes, counts in read_chunks(filename, CHUNK_SIZE)
+            )
+        _check_k(k)
+        bloom = cls.sized(n, fpr)
+        for codes in chunks:
+            if canonical:
+                codes = canonicalize(codes, k)
+            bloom.add_many(codes)
+        return bloom
+
+    def save(self, path, **metadata):
+        with open(path, 'wb') as fh:
+            np.savez(
+                fh, bits=self.bits, nbits=self.nbits, nhashes=self.nhashes,
+                **metadata
+            )
+
+    @classmethod
+    def load(cls, path):
+        """Returns the filter saved at `path` and its metadata."""
+        with np.load(path) as data:
+            bloom = cls(int(data['nbits']), int(data['nhashes']), data['bits'])
+            metadata = {
+                key: data[key].item() for key in data.files
+                if key not in ('bits', 'nbits', 'nhashes')
+            }
+        return bloom, metadata
+
+    @classmethod
+    def open(cls, filename, fpr=0.01, canonical=True):
+        """Returns the filter of a database, loaded from its `.bloom`
+        sidecar file when it is up to date and built and saved otherwise.
+        """
+        return open_sidecar(
+            cls, filename, '.bloom',
+            lambda: cls.build(filename, fpr, canonical),
+            canonical=canonical, fpr=fpr
+        )
+
+
+def _check_k(k):
+    if k > MAX_K:
+        raise ValueError('cannot build a bloom filter for k=%d > 32' % k)
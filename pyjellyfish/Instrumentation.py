@@ -0,0 +1,226 @@
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from functools import wraps
+
+
+# upper bounds in seconds of the latency histogram buckets
+BUCKETS = (
+    1e-6, 5e-6, 1e-5, 5e-5, 1e-4, 5e-4, 1e-3, 5e-3,
+    0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0
+)
+
+
+class MethodStats:
+    """Call count, cumulative time and latency histogram of a method."""
+
+    __slots__ = ('calls', 'seconds', 'buckets')
+
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+        # the last bucket counts calls slower than BUCKETS[-1]
+        self.buckets = [0] * (len(BUCKETS) + 1)
+
+    def as_dict(self):
+        return {
+            'calls': self.calls,
+            'seconds': self.seconds,
+            'buckets': dict(zip(
+                [str(b) for b in BUCKETS] + ['+Inf'], self.buckets
+            )),
+        }
+
+
+class Instrumentation:
+    """Records the calls of the methods it wraps and the loading of a
+    database.
+
+    Every call of a wrapped method is timed and counted, and then passed
+    to the hooks as `hook(method, seconds)`. Timings are inclusive, so a
+    method calling another wrapped method counts the time of both, as
+    cProfile's cumulative time does. `labels` are attached to every
+    metric exported by `report`.
+    """
+
+    def __init__(self, labels=None):
+        self.labels = dict(labels or {})
+        self.methods = {}
+        self.hooks = []
+        self.load_seconds = None
+        self.load_resident_bytes = None
+        self.database_bytes = None
+        self.lock = threading.Lock()
+
+    def add_hook(self, hook):
+        self.hooks.append(hook)
+
+    def remove_hook(self, hook):
+        self.hooks.remove(hook)
+
+    def record(self, method, seconds):
+        with self.lock:
+            stats = self.methods.get(method)
+            if stats is None:
+                stats = self.methods[method] = MethodStats()
+            stats.calls += 1
+            stats.seconds += seconds
+            stats.buckets[bisect_left(BUCKETS, seconds)] += 1
+        for hook in self.hooks:
+            hook(method, seconds)
+
+    def wrap(self, method, func):
+        """Returns `func` timed under the name `method`."""
+        record = self.record
+        perf_counter = time.perf_counter
+
+        @wraps(func)
+        def timed(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record(method, perf_counter() - start)
+
+        return timed
+
+    def counter(self, jf, kmer, canonical):
+        """Returns a function counting k-mer strings in `jf` as those of
+        Jellyfish._counter do, timing the setting of the MerDNA `kmer`,
+        its canonicalization and the hash probe as the methods
+        'MerDNA.set', 'MerDNA.canonicalize' and 'QueryMerFile.get'."""
+        record = self.record
+        perf_counter = time.perf_counter
+        set_kmer = kmer.set
+        canonicalize = kmer.canonicalize
+
+        def count(seq):
+            start = perf_counter()
+            set_kmer(seq)
+            record('MerDNA.set', perf_counter() - start)
+            if canonical:
+                start = perf_counter()
+                canonicalize()
+                record('MerDNA.canonicalize', perf_counter() - start)
+            start = perf_counter()
+            result = jf[kmer]
+            record('QueryMerFile.get', perf_counter() - start)
+            return result
+
+        return count
+
+    def wrap_load(self, func, filename):
+        """Returns `func`, which loads `filename`, recording the time it
+        takes and the growth of the resident size of the process."""
+        timed = self.wrap('load', func)
+
+        @wraps(func)
+        def load(*args, **kwargs):
+            rss = _resident_bytes()
+            start = time.perf_counter()
+            result = timed(*args, **kwargs)
+            self.load_seconds = time.perf_counter() - start
+            if rss is not None:
+                self.load_resident_bytes = _resident_bytes() - rss
+            if filename is not None:
+                self.database_bytes = os.path.getsize(filename)
+            return result
+
+        return load
+
+    def clear(self):
+        with self.lock:
+            self.methods = {}
+
+    def as_dict(self):
+        with self.lock:
+            return {
+                'labels': self.labels,
+                'load': {
+                    'seconds': self.load_seconds,
+                    'resident_bytes': self.load_resident_bytes,
+                    'database_bytes': self.database_bytes,
+                },
+                'methods': {
+                    name: stats.as_dict()
+                    for name, stats in sorted(self.methods.items())
+                },
+            }
+
+    def report(self, format='json'):
+        """Returns the metrics as a JSON document or in the Prometheus
+        text exposition format ('prometheus')."""
+        if format == 'json':
+            return json.dumps(self.as_dict(), indent=2)
+        if format == 'prometheus':
+            return self._prometheus()
+        raise ValueError("unknown report format '%s'" % format)
+
+    def _prometheus(self):
+        metrics = self.as_dict()
+        lines = []
+
+        def sample(name, value, **labels):
+            labels = dict(self.labels, **labels)
+            if labels:
+                name += '{%s}' % ','.join(
+                    '%s="%s"' % (key, _escape(value))
+                    for key, value in labels.items()
+                )
+            lines.append('%s %s' % (name, _number(value)))
+
+        load = metrics['load']
+        for name, value, description in [
+            ('pyjellyfish_load_seconds', load['seconds'],
+             'Time taken to load the database.'),
+            ('pyjellyfish_load_resident_bytes', load['resident_bytes'],
+             'Growth of the resident size when loading the database.'),
+            ('pyjellyfish_database_bytes', load['database_bytes'],
+             'Size of the database file.'),
+        ]:
+            if value is not None:
+                lines.append('# HELP %s %s' % (name, description))
+                lines.append('# TYPE %s gauge' % name)
+                sample(name, value)
+
+        lines.append('# HELP pyjellyfish_calls_total '
+                     'Calls of instrumented Jellyfish methods.')
+        lines.append('# TYPE pyjellyfish_calls_total counter')
+        for method, stats in metrics['methods'].items():
+            sample('pyjellyfish_calls_total', stats['calls'], method=method)
+
+        lines.append('# HELP pyjellyfish_call_seconds '
+                     'Latency of instrumented Jellyfish methods.')
+        lines.append('# TYPE pyjellyfish_call_seconds histogram')
+        for method, stats in metrics['methods'].items():
+            total = 0
+            for le, count in stats['buckets'].items():
+                total += count
+                sample('pyjellyfish_call_seconds_bucket', total,
+                       method=method, le=le)
+            sample('pyjellyfish_call_seconds_sum', stats['seconds'],
+                   method=method)
+            sample('pyjellyfish_call_seconds_count', stats['calls'],
+                   method=method)
+        return '\n'.join(lines) + '\n'
+
+
+def _resident_bytes():
+    """Returns the resident size of the process, where /proc provides
+    it."""
+    try:
+        with open('/proc/self/statm') as fh:
+            return int(fh.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return None
+
+
+def _escape(value):
+    value = str(value).replace('\\', '\\\\').replace('"', '\\"')
+    return value.replace('\n', '\\n')
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
@@ -1,36 +1,842 @@
+import multiprocessing
 import os
+import re
 import sys
+import threading
+from collections import deque, namedtuple
+from dataclasses import dataclass
+from itertools import islice
+import numpy as np
 import dna_jellyfish as jellyfish
+from pyjellyfish.BloomFilter import BloomFilter
+from pyjellyfish.fastx import read_fastx
+from pyjellyfish.Instrumentation import Instrumentation
+from pyjellyfish.Kmer import BASES, Kmer, decode
+from pyjellyfish.kmers import canonicalize, pack, pack_kmers, unpack
+from pyjellyfish.LRUCache import LRUCache
+from pyjellyfish.PersistentCache import PersistentCache, database_key
+from pyjellyfish.RawMerFile import RawMerFile, read_chunks, read_header
+from pyjellyfish.sidecar import open_sidecar
+from pyjellyfish.Sketch import VERSION as SKETCH_VERSION, Sketch
+from pyjellyfish.SolidIndex import SolidIndex
+
+
+Extension = namedtuple('Extension', ['seq', 'end', 'children'])
+Exploration = namedtuple('Exploration', ['paths', 'branches'])
+Annotation = namedtuple(
+    'Annotation',
+    ['name', 'length', 'n_kmers', 'min', 'median', 'mean', 'low_fraction']
+)
+
+SCAN_CHUNK_SIZE = 1 << 22
+
+# methods timed by Jellyfish.instrument, besides the database loading
+INSTRUMENTED = (
+    'query', 'query_many', 'query_codes', '_query_many', '_count', '_lookup',
+    'coverage', 'get_child', '_get_child', '_get_child_str', 'extend',
+    'explore', 'histogram', 'stats'
+)
+
+
+@dataclass
+class Stats:
+    """Database statistics, as reported by `jellyfish stats`."""
+    unique: int
+    distinct: int
+    total: int
+    max_count: int
 
 
 class Jellyfish:
-    """Provides a python front-end to query a Jellyfish database."""
+    """Provides a python front-end to query a Jellyfish database.
+
+    Sorted binary databases (the default `jellyfish count` output) are
+    memory-mapped read-only by QueryMerFile, so processes forked from
+    an instance share its pages through the page cache. Pickling an
+    instance only carries its settings and the database is mapped again
+    when unpickled.
+
+    An instance may be shared between threads: each thread parses k-mers
+    into its own MerDNA and the query cache is locked. Lookups do not
+    release the GIL however, so threads do not speed up querying; use
+    `parallel_query` or several processes instead.
+
+    With `bloom_fpr`, batch lookups (`query_many`, `query_codes` and
+    `coverage`) first check a bloom filter of the database k-mers with
+    that false-positive rate and k-mers it rules out are given a count
+    of 0 without probing the hash. Single k-mers are probed directly,
+    hashing one in Python costing more than the probe. The filter is
+    built on first use and saved next to the database as
+    `<filename>.bloom`.
+
+    `filename` may also be a SolidIndex written by `python -m
+    pyjellyfish.index`, in which case k-mers below its threshold are
+    reported with a count of 0.
+
+    `persistent_cache` is a PersistentCache, or the path of one, holding
+    counts across runs. Lookups read through it, so runs answered from it
+    never need the database.
+
+    The constructor only reads the header of the database (see `k`,
+    `counter_len` and `counted_canonical`) and the database is loaded on
+    the first lookup needing it. `preload` loads it up front and `close`
+    releases it until the next lookup.
 
-    def __init__(self, filename, cutoff=0.30, n_cutoff=500, canonical=True):
-        self.jf = jellyfish.QueryMerFile(filename)
-        self.k = jellyfish.MerDNA.k()
+    With `instrument`, the database loading and the calls of the lookup
+    and walk methods are timed, as are the setting of each k-mer into a
+    MerDNA, its canonicalization and the hash probe, see `instrument`
+    and `report`. Without it, methods are not wrapped and cost nothing
+    more.
+    """
+
+    def __init__(self, filename, cutoff=0.30, n_cutoff=500, canonical=True,
+                 cache_size=0, bloom_fpr=None, persistent_cache=None,
+                 instrument=False):
         self.filename = filename
         self.cutoff = cutoff
         self.n_cutoff = n_cutoff
         self.canonical = canonical
+        self._jf = None
+        self._lock = threading.Lock()
+        self._read_header()
+        if isinstance(persistent_cache, (str, os.PathLike)):
+            persistent_cache = PersistentCache(persistent_cache)
+        self.persistent = persistent_cache
+        if self.persistent is not None:
+            if self.k > 32:
+                raise ValueError(
+                    'cannot cache k-mers of k=%d > 32 persistently' % self.k
+                )
+            self._persistent_key = database_key(filename, self.k, canonical)
+        self.cache = LRUCache(cache_size) if cache_size else None
+        self.bloom_fpr = bloom_fpr
+        self.bloom = None
+        if bloom_fpr:
+            self.bloom = BloomFilter.open(filename, bloom_fpr, canonical)
+        self._local = threading.local()
+        self.instrumentation = None
+        if instrument:
+            self.instrument()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        for name in INSTRUMENTED + ('_open', '_counter'):
+            state.pop(name, None)
+        state['instrumentation'] = self.instrumentation is not None
+        del state['_jf']
+        del state['_lock']
+        del state['index']
+        del state['_local']
+        del state['bloom']
+        state['cache'] = self.cache.maxsize if self.cache is not None else 0
+        return state
+
+    def __setstate__(self, state):
+        cache_size = state.pop('cache')
+        instrumented = state.pop('instrumentation')
+        self.__dict__.update(state)
+        self.cache = LRUCache(cache_size) if cache_size else None
+        self._jf = None
+        self._lock = threading.Lock()
+        self._read_header()
+        self.bloom = None
+        if self.bloom_fpr:
+            self.bloom = BloomFilter.open(
+                self.filename, self.bloom_fpr, self.canonical
+            )
+        self._local = threading.local()
+        self.instrumentation = None
+        if instrumented:
+            self.instrument()
+
+    def _read_header(self):
+        """Sets k, the counter length in bytes and whether only canonical
+        k-mers were counted from the header of the database alone."""
+        if SolidIndex.is_index(self.filename):
+            # opening an index only maps it
+            self.index = SolidIndex(self.filename)
+            self.header = self.index.header
+            self.k = self.index.k
+            self.counter_len = self.index.counts.dtype.itemsize
+        else:
+            self.index = None
+            self.header, offset = read_header(self.filename)
+            self.k = self.header['key_len'] // 2
+            self.counter_len = self.header.get('counter_len')
+        self.counted_canonical = self.header.get('canonical')
+
+    def _open(self):
+        if self.index is not None:
+            self._jf = self.index
+            jellyfish.MerDNA.k(self.k)
+        else:
+            self._jf = jellyfish.QueryMerFile(self.filename)
+
+    @property
+    def jf(self):
+        """The QueryMerFile (or SolidIndex) of the database, loaded on
+        first access."""
+        jf = self._jf
+        if jf is None:
+            with self._lock:
+                if self._jf is None:
+                    self._open()
+                jf = self._jf
+        return jf
+
+    def preload(self):
+        """Loads the database now rather than on the first lookup and
+        returns the instance."""
+        self.jf
+        return self
+
+    def close(self):
+        """Releases the loaded database; the next lookup loads it again."""
+        with self._lock:
+            self._jf = None
+            self._local = threading.local()
+
+    def instrument(self, enabled=True):
+        """Starts or stops timing the methods listed in INSTRUMENTED,
+        the database loading and the stages of the lookups of k-mer
+        strings, and returns the Instrumentation recording them.
+
+        The stages are recorded as the methods 'MerDNA.set',
+        'MerDNA.canonicalize' and 'QueryMerFile.get', the time of
+        get_child minus theirs being that of the thresholding.
+
+        Methods are wrapped on the instance, so stopping removes any
+        overhead. Records are kept when stopping and restarting. Pickled
+        instances, such as those of pool workers, start with empty
+        records.
+        """
+        # the counters of the threads are made again, timed or not
+        self._local = threading.local()
+        if not enabled:
+            for name in INSTRUMENTED + ('_open', '_counter'):
+                self.__dict__.pop(name, None)
+            return self.instrumentation
+        if self.instrumentation is None:
+            self.instrumentation = Instrumentation(
+                {'database': self.filename}
+            )
+        cls = type(self)
+        for name in INSTRUMENTED:
+            self.__dict__[name] = self.instrumentation.wrap(
+                name, getattr(cls, name).__get__(self, cls)
+            )
+        self.__dict__['_open'] = self.instrumentation.wrap_load(
+            cls._open.__get__(self, cls), self.filename
+        )
+        self.__dict__['_counter'] = (
+            lambda kmer, canonical: self.instrumentation.counter(
+                self.jf, kmer, canonical
+            )
+        )
+        return self.instrumentation
+
+    def report(self, format='json'):
+        """Returns the calls and loading recorded since `instrument` as
+        JSON or in the Prometheus text format ('prometheus')."""
+        if self.instrumentation is None:
+            raise ValueError('instrumentation is not enabled')
+        return self.instrumentation.report(format)
+
+    @property
+    def _mer(self):
+        """MerDNA reused for the lookups of the calling thread."""
+        try:
+            return self._local.mer
+        except AttributeError:
+            # the k of a MerDNA is fixed at construction and set when
+            # loading the database
+            self.jf
+            mer = self._local.mer = jellyfish.MerDNA()
+            return mer
+
+    @property
+    def _counters(self):
+        """Functions counting k-mer strings in the MerDNA of the calling
+        thread, as given and canonicalized."""
+        try:
+            return self._local.counters
+        except AttributeError:
+            mer = self._mer
+            counters = self._local.counters = (
+                self._counter(mer, False), self._counter(mer, True)
+            )
+            return counters
+
+    def _counter(self, kmer, canonical):
+        """Returns a function setting a k-mer string into the MerDNA
+        `kmer`, canonicalizing it if `canonical`, and returning its count
+        in the database."""
+        jf = self.jf
+        set_kmer = kmer.set
+
+        if canonical:
+            canonicalize = kmer.canonicalize
+
+            def count(seq):
+                set_kmer(seq)
+                canonicalize()
+                return jf[kmer]
+        else:
+            def count(seq):
+                set_kmer(seq)
+                return jf[kmer]
+
+        return count
 
     def query(self, seq):
-        kmer = jellyfish.MerDNA(seq)
-        if (self.canonical):
-            kmer.canonicalize()
-        return self.jf[kmer]
+        """Returns the count of a k-mer given as a string or a Kmer."""
+        if isinstance(seq, Kmer):
+            return self._count(seq.canonical if self.canonical else seq.fwd)
+        if (self.cache is not None or self.index is not None
+                or self.persistent is not None):
+            # fail as QueryMerFile does: k-mers of another length raise
+            # and k-mers with a base other than A, C, G or T are absent
+            if len(seq) != self.k:
+                raise IndexError(
+                    'k-mer %r is not of length k=%d' % (seq, self.k)
+                )
+            try:
+                kmer = Kmer.from_str(seq)
+            except ValueError:
+                return 0
+            return self.query(kmer)
+        return self._counters[self.canonical](seq)
+
+    def cache_info(self):
+        """Returns hits, misses, evictions and size of the query cache."""
+        if self.cache is None:
+            return None
+        return self.cache.info()
+
+    def cache_clear(self):
+        """Empties the query cache and resets its statistics."""
+        if self.cache is not None:
+            self.cache.clear()
+
+    def _count(self, code):
+        """Returns the count of the k-mer of integer code `code`, which is
+        expected to be canonical already when querying canonical k-mers."""
+        if self.cache is not None:
+            count = self.cache.get(code)
+            if count is not None:
+                return count
+        if self.persistent is not None:
+            count = self.persistent.get(self._persistent_key, code)
+            if count is None:
+                count = self._lookup(code)
+                self.persistent.put(self._persistent_key, code, count)
+        else:
+            count = self._lookup(code)
+        if self.cache is not None:
+            self.cache.put(code, count)
+        return count
+
+    def _lookup(self, code):
+        if self.index is not None:
+            return self.index.count(code)
+        return self._counters[False](decode(code, self.k))
+
+    def query_many(self, seqs):
+        """Returns the counts of many k-mers as a numpy array.
+
+        `seqs` is either an iterable of k-mer strings, a packed string or
+        buffer (str, bytes, bytearray or a uint8 numpy array) of
+        concatenated k-mers, or a numpy array of fixed-width strings.
+        A single MerDNA is reused for every lookup. The query cache is
+        not consulted. With a SolidIndex, a bloom filter or a persistent
+        cache, k-mers are instead packed in bulk by pyjellyfish.kmers and
+        looked up with `query_codes`, k-mers containing N being given a
+        count of 0.
+        """
+        if (self.index is None and self.bloom is None
+                and self.persistent is None):
+            return self._query_many(_split_kmers(seqs, self.k))
+        codes, valid = pack_kmers(seqs, self.k, self.canonical)
+        counts = np.zeros(len(codes), dtype=np.uint32)
+        counts[valid] = self.query_codes(codes[valid])
+        return counts
+
+    def query_codes(self, codes):
+        """Returns the counts of k-mers given as an array of 2-bit codes,
+        as made by pyjellyfish.kmers (k <= 32).
+
+        Codes are expected to be canonical already when querying canonical
+        k-mers. They are filtered by the bloom filter, read from the
+        persistent cache and looked up in bulk in a SolidIndex; with a
+        Jellyfish database they are unpacked for QueryMerFile.
+        """
+        codes = np.asarray(codes, dtype=np.uint64)
+        counts = np.zeros(len(codes), dtype=np.uint32)
+        todo = np.arange(len(codes))
+        if self.bloom is not None:
+            todo = todo[self.bloom.contains_many(codes)]
+        if self.persistent is not None:
+            cached = self.persistent.get_many(
+                self._persistent_key, codes[todo].tolist()
+            )
+            if cached:
+                hit = np.array(
+                    [code in cached for code in codes[todo].tolist()],
+                    dtype=bool
+                )
+                counts[todo[hit]] = [
+                    cached[code] for code in codes[todo[hit]].tolist()
+                ]
+                todo = todo[~hit]
+        if len(todo):
+            if self.index is not None:
+                counts[todo] = self.index.count_many(codes[todo])
+            else:
+                counts[todo] = self._query_many(
+                    unpack(codes[todo], self.k).astype('U').tolist()
+                )
+            if self.persistent is not None:
+                self.persistent.put_many(
+                    self._persistent_key,
+                    zip(codes[todo].tolist(), counts[todo].tolist())
+                )
+        return counts
+
+    def _query_many(self, seqs):
+        count = self._counters[self.canonical]
+        return np.fromiter(map(count, seqs), dtype=np.uint32, count=len(seqs))
+
+    def parallel_query(self, seqs, processes=None, chunk_size=100000):
+        """Returns the counts of many k-mers, as `query_many`, splitting
+        them in chunks queried by a pool of `processes` workers.
+
+        Workers are forked when the platform allows it and then share
+        this instance's mapping of the database. Otherwise they receive
+        a pickled copy, which maps the database again.
+        """
+        seqs = _split_kmers(seqs, self.k)
+        chunks = [
+            seqs[i:i + chunk_size] for i in range(0, len(seqs), chunk_size)
+        ]
+        if not chunks:
+            return np.zeros(0, dtype=np.uint32)
+        with _pool_context().Pool(processes, _init_worker, (self,)) as pool:
+            return np.concatenate(pool.map(_worker_query_many, chunks))
+
+    def annotate(self, path, chunk_size=1000, processes=0):
+        """Yields an Annotation summarizing the k-mer counts of every
+        record of a FASTA/FASTQ file, gzipped or not, in file order.
+
+        Records are read `chunk_size` at a time and the k-mers of a
+        whole chunk are looked up with one `query_many` call. K-mers
+        containing a base other than A, C, G or T are left out and
+        `low_fraction` is the fraction of k-mers below `n_cutoff`.
+        Records without k-mers have None summaries. With `processes`,
+        chunks are annotated by a pool of workers, as in
+        `parallel_query`, with at most two chunks in flight per worker.
+        """
+        records = read_fastx(path)
+        chunks = iter(lambda: list(islice(records, chunk_size)), [])
+        if not processes:
+            for chunk in chunks:
+                yield from self._annotate(chunk)
+            return
+        with _pool_context().Pool(processes, _init_worker, (self,)) as pool:
+            pending = deque()
+            for chunk in chunks:
+                pending.append(pool.apply_async(_worker_annotate, (chunk,)))
+                if len(pending) >= 2 * processes:
+                    yield from pending.popleft().get()
+            while pending:
+                yield from pending.popleft().get()
+
+    def histogram(self, max_count=10000, processes=0):
+        """Returns the count spectrum of the database as a numpy array
+        h, h[c] being the number of k-mers seen c times. K-mers seen more
+        than `max_count` times are tallied in h[max_count].
+
+        Binary databases are memory-mapped and scanned in ranges of
+        records, spread over `processes` workers when given. Other
+        formats are streamed with ReadMerFile.
+        """
+        return self._scan(max_count, processes)[0]
+
+    def stats(self, processes=0):
+        """Returns the Stats of the database, scanned as in `histogram`."""
+        hist, total, max_count = self._scan(2, processes)
+        return Stats(int(hist[1]), int(hist.sum()), total, max_count)
+
+    def sketch(self, size=1000, seed=42, min_count=1, processes=0):
+        """Returns a bottom-k MinHash Sketch of the k-mers of the database
+        seen at least `min_count` times (k <= 32), to be compared with
+        other databases by `pyjellyfish.compare`.
+
+        The sketch is loaded from the `<filename>.sketch` sidecar file
+        when it was made from the same database with the same parameters,
+        and built and saved otherwise. Building reads the database in
+        chunks as `histogram` does, binary databases with `processes`
+        workers, and keeps the `size` smallest hashes of every chunk.
+        """
+        if self.k > 32:
+            raise ValueError('cannot sketch k-mers of k=%d > 32' % self.k)
+        if self.filename is None:
+            raise ValueError('k-mers counted in memory cannot be scanned')
+        return open_sidecar(
+            Sketch, self.filename, '.sketch',
+            lambda: Sketch.merge(
+                [Sketch([], [], size, seed, self.k)]
+                + self._sketch_chunks(size, seed, min_count, processes)
+            ),
+            lambda sketch: (sketch.size, sketch.seed) == (size, seed),
+            version=SKETCH_VERSION, canonical=self.canonical,
+            min_count=min_count
+        )
+
+    def _sketch_chunks(self, size, seed, min_count, processes):
+        params = (size, seed, min_count, self.canonical, self.k)
+        if self.index is not None:
+            return [
+                _sketch_codes(
+                    self.index.codes[start:start + SCAN_CHUNK_SIZE],
+                    self.index.counts[start:start + SCAN_CHUNK_SIZE],
+                    *params
+                )
+                for start in range(0, len(self.index), SCAN_CHUNK_SIZE)
+            ]
+        if not RawMerFile.is_binary(self.filename):
+            return [
+                _sketch_codes(codes, counts, *params)
+                for codes, counts in read_chunks(
+                    self.filename, SCAN_CHUNK_SIZE
+                )
+            ]
+        args = [
+            (self.filename, start, stop, size, seed, min_count,
+             self.canonical)
+            for start, stop in RawMerFile(self.filename).ranges(
+                max(processes, 1), SCAN_CHUNK_SIZE
+            )
+        ]
+        if processes:
+            with _pool_context().Pool(processes) as pool:
+                return pool.starmap(_sketch_range, args)
+        return [_sketch_range(*x) for x in args]
+
+    def _scan(self, max_count, processes=0):
+        """Returns the histogram, total and maximum of the counts."""
+        if self.index is not None:
+            return _summarize(self.index.counts, max_count)
+        if self.filename is None:
+            raise ValueError('k-mers counted in memory cannot be scanned')
+        if not RawMerFile.is_binary(self.filename):
+            results = [
+                _summarize(counts, max_count)
+                for kmers, counts in read_chunks(
+                    self.filename, SCAN_CHUNK_SIZE, encode=False
+                )
+            ]
+        else:
+            ranges = RawMerFile(self.filename).ranges(
+                max(processes, 1), SCAN_CHUNK_SIZE
+            )
+            args = [
+                (self.filename, start, stop, max_count)
+                for start, stop in ranges
+            ]
+            if processes:
+                with _pool_context().Pool(processes) as pool:
+                    results = pool.starmap(_scan_range, args)
+            else:
+                results = [_scan_range(*x) for x in args]
+        return (
+            sum(x[0] for x in results),
+            sum(x[1] for x in results),
+            max(x[2] for x in results)
+        )
+
+    def _annotate(self, records):
+        kmers = []
+        offsets = [0]
+        for name, seq in records:
+            kmers.extend(_windows(seq, self.k))
+            offsets.append(len(kmers))
+        counts = self.query_many(kmers)
+        annotations = []
+        for (name, seq), start, end in zip(records, offsets, offsets[1:]):
+            c = counts[start:end]
+            if not len(c):
+                annotations.append(
+                    Annotation(name, len(seq), 0, None, None, None, None)
+                )
+                continue
+            low = np.count_nonzero(c < self.n_cutoff)
+            annotations.append(Annotation(
+                name, len(seq), len(c), int(c.min()), float(np.median(c)),
+                float(c.mean()), float(low / len(c))
+            ))
+        return annotations
+
+    def coverage(self, seq):
+        """Returns the count of every k-mer along `seq` as a numpy array.
+
+        Position i holds the count of seq[i:i+k]. Windows containing a
+        base other than A, C, G or T are given a count of 0. Each run of
+        valid bases is scanned by a single rolling k-mer or, with a
+        SolidIndex, a bloom filter or a persistent cache, packed in bulk
+        and looked up with `query_codes`.
+        """
+        if (self.index is not None or self.bloom is not None
+                or self.persistent is not None):
+            codes, valid = pack(seq, self.k, self.canonical)
+            counts = np.zeros(len(codes), dtype=np.uint32)
+            counts[valid] = self.query_codes(codes[valid])
+            return counts
+        counts = np.zeros(max(len(seq) - self.k + 1, 0), dtype=np.uint32)
+        string_mers = (
+            jellyfish.string_canonicals if self.canonical
+            else jellyfish.string_mers
+        )
+        jf = self.jf
+        for run in re.finditer('[ACGTacgt]{%d,}' % self.k, seq):
+            start, end = run.span()
+            # the iterator of a StringMers, and the MerDNA it yields, do
+            # not own it: it must outlive the loop
+            mers = string_mers(run.group())
+            counts[start:end - self.k + 1] = np.fromiter(
+                (jf[kmer] for kmer in mers),
+                dtype=np.uint32,
+                count=end - start - self.k + 1
+            )
+        return counts
 
     def get_child(self, seq, forward=True):
-        child = []
-        sum = 0
-        for c in ['A', 'C', 'G', 'T']:
+        if isinstance(seq, Kmer):
+            return self._get_child(seq, forward)
+        return self._get_child_str(seq, forward)
+
+    def _get_child_str(self, seq, forward=True):
+        """get_child of a k-mer string. Without a cache or a SolidIndex,
+        each child is set into the reused MerDNA and looked up in the
+        database directly, which costs less than packing it into a Kmer
+        and decoding it back."""
+        if forward:
+            child = [seq[1:] + base for base in BASES]
+        else:
+            child = [base + seq[:-1] for base in BASES]
+        if (self.cache is not None or self.index is not None
+                or self.persistent is not None):
+            counts = [self.query(c_seq) for c_seq in child]
+        else:
+            count = self._counters[self.canonical]
+            counts = [count(c_seq) for c_seq in child]
+        threshold = max(sum(counts) * self.cutoff, self.n_cutoff)
+
+        return [x for x, count in zip(child, counts) if count >= threshold]
+
+    def _get_child(self, kmer, forward=True):
+        shift = kmer.shift_left if forward else kmer.shift_right
+        if (self.cache is None and self.index is None
+                and self.persistent is None):
+            # the string path decodes the k-mer once rather than every
+            # child
+            i = -1 if forward else 0
+            return [
+                shift(BASES.index(x[i]))
+                for x in self._get_child_str(str(kmer), forward)
+            ]
+        child = [shift(code) for code in range(4)]
+        if self.canonical:
+            counts = [self._count(x.canonical) for x in child]
+        else:
+            counts = [self._count(x.fwd) for x in child]
+        threshold = max(sum(counts) * self.cutoff, self.n_cutoff)
+
+        return [x for x, count in zip(child, counts) if count >= threshold]
+
+    def extend(self, seed, forward=True, max_len=1000, visited=None):
+        """Extends `seed` one base at a time while it has a single child.
+
+        Children are selected as in `get_child`. The walk stops at a dead
+        end, a branch, an already visited k-mer or once the sequence
+        reaches `max_len` bases. Returns an Extension holding the
+        extended sequence, the reason it ended ('dead_end', 'branch',
+        'visited' or 'max_len') and the children of its last k-mer.
+        Visited k-mers are recorded as 2-bit-encoded integers in the
+        `visited` set, which may be shared between walks.
+        """
+        if visited is None:
+            visited = set()
+        kmer = Kmer.from_str(
+            seed[-self.k:] if forward else seed[:self.k], self.k
+        )
+        visited.add(self._node(kmer))
+        codes = []
+        max_bases = max_len - len(seed)
+        while True:
+            children = self._get_child(kmer, forward)
+            if not children:
+                end = 'dead_end'
+                break
+            if len(children) > 1:
+                end = 'branch'
+                break
+            if len(codes) >= max_bases:
+                end = 'max_len'
+                break
+            kmer = children[0]
+            node = self._node(kmer)
+            if node in visited:
+                end = 'visited'
+                break
+            visited.add(node)
             if forward:
-                c_seq = seq[1:] + c
+                codes.append(kmer.fwd & 3)
             else:
-                c_seq = c + seq[0:-1]
-            c_count = self.query(c_seq)
-            child.append((c_seq, c_count))
-            sum += c_count
-        threshold = max(sum * self.cutoff, self.n_cutoff)
+                codes.append(kmer.fwd >> 2 * (self.k - 1))
+
+        bases = ''.join([BASES[code] for code in codes])
+        if forward:
+            seq = seed + bases
+        else:
+            seq = bases[::-1] + seed
+        return Extension(seq, end, [str(x) for x in children])
+
+    def explore(self, seeds, forward=True, max_nodes=100000, max_len=None):
+        """Walks the graph breadth-first from `seeds` using `extend`.
+
+        Every unvisited child of a branch starts a new path. Paths are
+        extended up to `max_len` bases when given and otherwise as far as
+        the `max_nodes` distinct k-mers to visit allow; no new path is
+        started once they have all been visited. Returns an Exploration
+        holding the list of Extension paths and a dict mapping each
+        branching k-mer to its children.
+        """
+        visited = set()
+        paths = []
+        branches = {}
+        queue = deque(seeds)
+        while queue and len(visited) < max_nodes:
+            seed = queue.popleft()
+            kmer = Kmer.from_str(
+                seed[-self.k:] if forward else seed[:self.k], self.k
+            )
+            if self._node(kmer) in visited:
+                continue
+            # the seed is visited too
+            limit = len(seed) + max_nodes - len(visited) - 1
+            if max_len is not None:
+                limit = min(limit, max_len)
+            path = self.extend(seed, forward, limit, visited)
+            paths.append(path)
+            if path.end == 'branch':
+                kmer = path.seq[-self.k:] if forward else path.seq[:self.k]
+                branches[kmer] = path.children
+                queue.extend(path.children)
+        return Exploration(paths, branches)
+
+    def _node(self, kmer):
+        return kmer.canonical if self.canonical else kmer.fwd
+
+
+_worker_db = None
+
+
+def _init_worker(db):
+    global _worker_db
+    _worker_db = db
+
+
+def _worker_run(func, *args):
+    return func(_worker_db, *args)
+
+
+def _worker_query_many(seqs):
+    counts = _worker_db.query_many(seqs)
+    _worker_flush()
+    return counts
+
+
+def _worker_annotate(records):
+    annotations = _worker_db._annotate(records)
+    _worker_flush()
+    return annotations
+
+
+def _worker_flush():
+    # pool workers exit without running the atexit flush of the cache
+    if _worker_db.persistent is not None:
+        _worker_db.persistent.flush()
+
+
+def _scan_range(filename, start, stop, max_count):
+    return _summarize(RawMerFile(filename).counts(start, stop), max_count)
+
+
+def _sketch_range(filename, start, stop, size, seed, min_count, canonical):
+    raw = RawMerFile(filename)
+    return _sketch_codes(
+        raw.codes(start, stop), raw.counts(start, stop),
+        size, seed, min_count, canonical, raw.k
+    )
+
+
+def _sketch_codes(codes, counts, size, seed, min_count, canonical, k):
+    codes = np.asarray(codes, dtype=np.uint64)
+    counts = np.asarray(counts, dtype=np.uint64)
+    keep = counts >= min_count
+    codes = codes[keep]
+    if canonical:
+        codes = canonicalize(codes, k)
+    return Sketch.from_codes(codes, counts[keep], size, seed, k)
+
+
+def _summarize(counts, max_count):
+    counts = np.asarray(counts, dtype=np.uint64)
+    hist = np.bincount(
+        np.minimum(counts, max_count).astype(np.intp),
+        minlength=max_count + 1
+    )
+    return hist, int(counts.sum()), int(counts.max()) if len(counts) else 0
+
+
+def _pool_context():
+    """Returns the fork context where available, for workers to share
+    the parent's mapping of the database."""
+    if 'fork' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('fork')
+    return multiprocessing.get_context()
+
+
+def _windows(seq, k):
+    """Returns the k-mers of `seq` made only of A, C, G and T."""
+    return [
+        run[i:i + k]
+        for run in re.findall('[ACGTacgt]{%d,}' % k, seq)
+        for i in range(len(run) - k + 1)
+    ]
+
 
-        return [x[0] for x in [x for x in child if x[1] >= threshold]]
+def _split_kmers(seqs, k):
+    """Returns `seqs` as a sequence of k-mer strings."""
+    if isinstance(seqs, np.ndarray):
+        if seqs.dtype.kind == 'U':
+            return seqs.ravel().tolist()
+        if seqs.dtype.kind == 'S':
+            return [s.decode('ascii') for s in seqs.ravel().tolist()]
+        if seqs.dtype == np.uint8:
+            seqs = seqs.tobytes()
+        else:
+            raise TypeError('unsupported k-mer array dtype %s' % seqs.dtype)
+    if isinstance(seqs, (bytes, bytearray, memoryview)):
+        seqs = bytes(seqs).decode('ascii')
+    if isinstance(seqs, str):
+        packed = seqs
+        if len(packed) % k:
+            raise ValueError(
+                'packed k-mer buffer of length %d is not a multiple of k=%d'
+                % (len(packed), k)
+            )
+        return [packed[i:i + k] for i in range(0, len(packed), k)]
+    if not isinstance(seqs, (list, tuple)):
+        seqs = list(seqs)
+    return seqs
@@ -0,0 +1,75 @@
+import json
+import socket
+import numpy as np
+from pyjellyfish.Jellyfish import Jellyfish, _split_kmers
+from pyjellyfish.Kmer import Kmer
+
+
+class JellyfishClient:
+    """Queries a database served by `python -m pyjellyfish.serve` with the
+    same interface as Jellyfish.
+
+    `cutoff` and `n_cutoff` default to those the server was started
+    with. `extend` and `explore` walk the graph on the client side,
+    sending one get_child request per k-mer of the walk.
+    """
+
+    def __init__(self, path, cutoff=None, n_cutoff=None):
+        self.path = path
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(path)
+        self.stream = self.sock.makefile('rwb')
+        info = self._call('info')
+        self.filename = info['filename']
+        self.k = info['k']
+        self.canonical = info['canonical']
+        self.cutoff = info['cutoff'] if cutoff is None else cutoff
+        self.n_cutoff = info['n_cutoff'] if n_cutoff is None else n_cutoff
+
+    def _call(self, method, *args):
+        request = {'method': method, 'args': args}
+        self.stream.write(json.dumps(request).encode() + b'\n')
+        self.stream.flush()
+        line = self.stream.readline()
+        if not line:
+            raise ConnectionError(
+                'server at %s closed the connection' % self.path
+            )
+        response = json.loads(line)
+        if 'error' in response:
+            raise RuntimeError(response['error'])
+        return response['result']
+
+    def close(self):
+        self.stream.close()
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def query(self, seq):
+        return self._call('query', str(seq))
+
+    def query_many(self, seqs):
+        seqs = [str(s) for s in _split_kmers(seqs, self.k)]
+        return np.array(self._call('query_many', seqs), dtype=np.uint32)
+
+    def coverage(self, seq):
+        return np.array(self._call('coverage', str(seq)), dtype=np.uint32)
+
+    def get_child(self, seq, forward=True):
+        child = self._call(
+            'get_child', str(seq), forward, self.cutoff, self.n_cutoff
+        )
+        if isinstance(seq, Kmer):
+            return [Kmer.from_str(x) for x in child]
+        return child
+
+    # the walks of Jellyfish only need the children of Kmers
+    _get_child = get_child
+    _node = Jellyfish._node
+    extend = Jellyfish.extend
+    explore = Jellyfish.explore
@@ -0,0 +1,119 @@
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import numpy as np
+import dna_jellyfish as jellyfish
+from pyjellyfish.Jellyfish import (
+    Jellyfish, _init_worker, _pool_context, _split_kmers, _worker_run
+)
+
+
+CHUNK_SIZE = 65536
+
+
+class JellyfishCollection:
+    """Provides a python front-end to query several Jellyfish databases
+    built with the same k, one column per database."""
+
+    def __init__(self, filenames, cutoff=0.30, n_cutoff=500, canonical=True):
+        self.filenames = list(filenames)
+        self.databases = [
+            Jellyfish(f, cutoff, n_cutoff, canonical) for f in self.filenames
+        ]
+        ks = sorted(set(db.k for db in self.databases))
+        if len(ks) > 1:
+            raise ValueError(
+                'databases do not share the same k: %s'
+                % ', '.join('%s (k=%d)' % (db.filename, db.k)
+                            for db in self.databases)
+            )
+        self.k = ks[0] if ks else jellyfish.MerDNA.k()
+        self.cutoff = cutoff
+        self.n_cutoff = n_cutoff
+        self.canonical = canonical
+        self._pool = None
+        self._processes = 0
+
+    def __len__(self):
+        return len(self.databases)
+
+    def query(self, seq):
+        """Returns the count of a k-mer in every database."""
+        return self.query_many([seq])[0]
+
+    def query_many(self, seqs, threads=0, processes=0):
+        """Returns the counts of many k-mers as a (n_kmers, n_databases)
+        numpy array.
+
+        `seqs` takes the same forms as in `Jellyfish.query_many`. Each
+        k-mer is parsed and canonicalized once per chunk and then looked
+        up in every database, either in turn or with one task per
+        database on `threads` threads. With `processes`, each database is
+        instead queried by a pool of worker processes, which receive the
+        databases when they start and are kept until `close`.
+        """
+        seqs = _split_kmers(seqs, self.k)
+        counts = np.zeros((len(seqs), len(self.databases)), dtype=np.uint32)
+
+        if processes:
+            columns = self._process_pool(processes).map(
+                _worker_run,
+                [_query_database] * len(self.databases),
+                range(len(self.databases)),
+                [seqs] * len(self.databases)
+            )
+            for j, column in enumerate(columns):
+                counts[:, j] = column
+            return counts
+
+        # MerDNAs take the k set by loading the databases
+        for db in self.databases:
+            db.preload()
+        pool = ThreadPoolExecutor(threads) if threads else None
+        try:
+            for start in range(0, len(seqs), CHUNK_SIZE):
+                chunk = seqs[start:start + CHUNK_SIZE]
+                mers = [jellyfish.MerDNA(s) for s in chunk]
+                if self.canonical:
+                    for mer in mers:
+                        mer.canonicalize()
+                end = start + len(mers)
+
+                def lookup(j):
+                    jf = self.databases[j].jf
+                    counts[start:end, j] = np.fromiter(
+                        (jf[mer] for mer in mers),
+                        dtype=np.uint32,
+                        count=len(mers)
+                    )
+
+                if pool is None:
+                    for j in range(len(self.databases)):
+                        lookup(j)
+                else:
+                    list(pool.map(lookup, range(len(self.databases))))
+        finally:
+            if pool is not None:
+                pool.shutdown()
+        return counts
+
+    def _process_pool(self, processes):
+        if self._pool is not None and self._processes != processes:
+            self._pool.shutdown()
+            self._pool = None
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                processes, _pool_context(), _init_worker, (self.databases,)
+            )
+            self._processes = processes
+        return self._pool
+
+    def close(self):
+        """Stops the worker processes and releases the loaded databases."""
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+        for db in self.databases:
+            db.close()
+
+
+def _query_database(databases, j, seqs):
+    return databases[j].query_many(seqs)
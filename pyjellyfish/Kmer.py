@@ -0,0 +1,97 @@
+BASES = 'ACGT'
+
+_CODES = str.maketrans('ACGTacgt', '01230123')
+_RC_CODES = str.maketrans('ACGTacgt', '32103210')
+_NOT_BASES = str.maketrans('', '', 'ACGTacgt')
+_HEX_BASES = str.maketrans({
+    '%x' % i: BASES[i >> 2] + BASES[i & 3] for i in range(16)
+})
+
+
+def encode(seq):
+    """Returns the k-mer string as an integer of 2 bits per base."""
+    return int(seq.translate(_CODES), 4)
+
+
+def decode(code, k):
+    """Returns the k-mer string of an integer of 2 bits per base."""
+    return ('%0*x' % ((k + 1) // 2, code)).translate(_HEX_BASES)[k & 1:]
+
+
+class Kmer:
+    """Immutable k-mer packed as 2 bits per base (A=0, C=1, G=2, T=3).
+
+    Both strands are kept so that shifting in a base, taking the reverse
+    complement or the canonical form are constant-time integer operations.
+    """
+
+    __slots__ = ('k', 'fwd', 'rev')
+
+    def __init__(self, k, fwd, rev):
+        self.k = k
+        self.fwd = fwd
+        self.rev = rev
+
+    @classmethod
+    def from_str(cls, seq, k=None):
+        """Returns the Kmer of a string of A, C, G and T, in either case,
+        checking that it is of length `k` when given."""
+        if k is not None and len(seq) != k:
+            raise ValueError('k-mer %r is not of length k=%d' % (seq, k))
+        if seq.translate(_NOT_BASES):
+            raise ValueError('k-mer %r has a base other than A, C, G or T'
+                             % seq)
+        return cls(
+            len(seq),
+            int(seq.translate(_CODES), 4),
+            int(seq.translate(_RC_CODES)[::-1], 4)
+        )
+
+    @property
+    def canonical(self):
+        """Smaller code of the k-mer and its reverse complement."""
+        return self.fwd if self.fwd < self.rev else self.rev
+
+    def get_canonical(self):
+        if self.fwd <= self.rev:
+            return self
+        return Kmer(self.k, self.rev, self.fwd)
+
+    def get_reverse_complement(self):
+        return Kmer(self.k, self.rev, self.fwd)
+
+    def shift_left(self, code):
+        """Drops the first base and appends the base of code `code`."""
+        k = self.k
+        return Kmer(
+            k,
+            ((self.fwd << 2) | code) & ((1 << 2 * k) - 1),
+            (self.rev >> 2) | ((3 - code) << 2 * (k - 1))
+        )
+
+    def shift_right(self, code):
+        """Drops the last base and prepends the base of code `code`."""
+        k = self.k
+        return Kmer(
+            k,
+            (self.fwd >> 2) | (code << 2 * (k - 1)),
+            ((self.rev << 2) | (3 - code)) & ((1 << 2 * k) - 1)
+        )
+
+    def __eq__(self, other):
+        return (
+            isinstance(other, Kmer)
+            and self.k == other.k and self.fwd == other.fwd
+        )
+
+    def __hash__(self):
+        return hash((self.k, self.fwd))
+
+    def __len__(self):
+        return self.k
+
+    def __str__(self):
+        return decode(self.fwd, self.k)
+
+    def __repr__(self):
+        return 'Kmer(%r)' % str(self)
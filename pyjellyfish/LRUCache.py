@@ -0,0 +1,59 @@
+import threading
+from collections import OrderedDict, namedtuple
+
+
+CacheInfo = namedtuple(
+    'CacheInfo',
+    ['hits', 'misses', 'evictions', 'maxsize', 'currsize']
+)
+
+
+class LRUCache:
+    """Thread-safe size-bounded mapping evicting the least recently used
+    entry."""
+
+    def __init__(self, maxsize):
+        if maxsize <= 0:
+            raise ValueError('cache size must be positive, got %d' % maxsize)
+        self.maxsize = maxsize
+        self.data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self.lock:
+            try:
+                value = self.data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self.data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self.lock:
+            self.data[key] = value
+            self.data.move_to_end(key)
+            if len(self.data) > self.maxsize:
+                self.data.popitem(last=False)
+                self.evictions += 1
+
+    def info(self):
+        with self.lock:
+            return CacheInfo(
+                self.hits, self.misses, self.evictions,
+                self.maxsize, len(self.data)
+            )
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def __len__(self):
+        return len(self.data)
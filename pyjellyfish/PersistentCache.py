@@ -0,0 +1,211 @@
+import atexit
+import os
+import sqlite3
+import threading
+import weakref
+from pyjellyfish.LRUCache import CacheInfo
+
+
+FLUSH_SIZE = 10000
+SQL_BATCH = 500
+
+_instances = weakref.WeakSet()
+
+
+def database_key(filename, k, canonical):
+    """Identifies a database file and the way it is queried, so that
+    counts cached for a replaced or modified file are not reused."""
+    st = os.stat(filename)
+    return '%s:%d:%d:%d:%d' % (
+        os.path.realpath(filename), st.st_size, st.st_mtime_ns, k,
+        bool(canonical)
+    )
+
+
+def _signed(code):
+    """Maps a 64-bit k-mer code to SQLite's signed INTEGER range."""
+    return code - (1 << 64) if code >= 1 << 63 else code
+
+
+def _unsigned(code):
+    return code + (1 << 64) if code < 0 else code
+
+
+class PersistentCache:
+    """SQLite-backed cache of k-mer counts kept across runs.
+
+    Counts are keyed on a database key (see `database_key`) and the
+    2-bit integer code of the k-mer, so a single file can serve several
+    databases. New counts are written in batches of `FLUSH_SIZE` and on
+    `flush`, which also runs at exit and when the cache is closed or
+    garbage collected. Once the cache holds more than
+    `max_size` counts, the least recently used ones are evicted, recency
+    being tracked per flush.
+
+    SQLite connections cannot be used across fork, so a forked child
+    opens its own connection and starts without the pending counts of
+    its parent. Pool workers exit without running atexit hooks and must
+    `flush` themselves.
+    """
+
+    def __init__(self, path, max_size=10000000):
+        self.path = path
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.RLock()
+        self._connect()
+        _instances.add(self)
+
+    def _connect(self):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        self.db = sqlite3.connect(self.path, check_same_thread=False)
+        self.db.execute(
+            'CREATE TABLE IF NOT EXISTS counts ('
+            'db TEXT, code INTEGER, count INTEGER, used INTEGER, '
+            'PRIMARY KEY (db, code)) WITHOUT ROWID'
+        )
+        self.db.execute(
+            'CREATE INDEX IF NOT EXISTS counts_used ON counts (used)'
+        )
+        self.db.commit()
+        self.tick, self.size = self.db.execute(
+            'SELECT COALESCE(MAX(used), 0), COUNT(*) FROM counts'
+        ).fetchone()
+        self.pending = {}
+        self.touched = set()
+
+    def _after_fork(self):
+        # the connection of the parent is kept unused rather than closed,
+        # which could release the locks the parent holds on the file
+        self._inherited_db = self.db
+        self.lock = threading.RLock()
+        self._connect()
+
+    def __getstate__(self):
+        return {'path': self.path, 'max_size': self.max_size}
+
+    def __setstate__(self, state):
+        self.__init__(state['path'], state['max_size'])
+
+    def get(self, db, code):
+        return self.get_many(db, [code]).get(code)
+
+    def get_many(self, db, codes):
+        """Returns a dict of the cached counts of k-mer codes."""
+        found = {}
+        with self.lock:
+            lookup = []
+            for code in codes:
+                count = self.pending.get((db, code))
+                if count is None:
+                    lookup.append(_signed(code))
+                else:
+                    found[code] = count
+            for i in range(0, len(lookup), SQL_BATCH):
+                batch = lookup[i:i + SQL_BATCH]
+                rows = self.db.execute(
+                    'SELECT code, count FROM counts WHERE db = ? '
+                    'AND code IN (%s)' % ','.join('?' * len(batch)),
+                    [db] + batch
+                )
+                for code, count in rows:
+                    found[_unsigned(code)] = count
+                    self.touched.add((db, code))
+            self.hits += len(found)
+            self.misses += len(codes) - len(found)
+        return found
+
+    def put(self, db, code, count):
+        self.put_many(db, [(code, count)])
+
+    def put_many(self, db, items):
+        with self.lock:
+            for code, count in items:
+                self.pending[(db, code)] = count
+            if len(self.pending) >= FLUSH_SIZE:
+                self.flush()
+
+    def flush(self):
+        """Writes pending counts and evicts the least recently used ones
+        past `max_size`."""
+        with self.lock:
+            if not self.pending and not self.touched:
+                return
+            self.tick += 1
+            self.db.executemany(
+                'INSERT OR REPLACE INTO counts VALUES (?, ?, ?, ?)',
+                [
+                    (db, _signed(code), count, self.tick)
+                    for (db, code), count in self.pending.items()
+                ]
+            )
+            self.db.executemany(
+                'UPDATE counts SET used = ? WHERE db = ? AND code = ?',
+                [(self.tick, db, code) for db, code in self.touched]
+            )
+            self.size += len(self.pending)
+            self.pending = {}
+            self.touched = set()
+            if self.size > self.max_size:
+                self.size = self.db.execute(
+                    'SELECT COUNT(*) FROM counts'
+                ).fetchone()[0]
+            if self.size > self.max_size:
+                deleted = self.db.execute(
+                    'DELETE FROM counts WHERE (db, code) IN ('
+                    'SELECT db, code FROM counts ORDER BY used LIMIT ?)',
+                    (self.size - self.max_size,)
+                ).rowcount
+                self.evictions += deleted
+                self.size -= deleted
+            self.db.commit()
+
+    def info(self):
+        with self.lock:
+            return CacheInfo(
+                self.hits, self.misses, self.evictions,
+                self.max_size, self.size + len(self.pending)
+            )
+
+    def clear(self):
+        with self.lock:
+            self.db.execute('DELETE FROM counts')
+            self.db.commit()
+            self.pending = {}
+            self.touched = set()
+            self.size = 0
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def close(self):
+        """Flushes the pending counts and closes the connection."""
+        with self.lock:
+            if self.db is None:
+                return
+            self.flush()
+            self.db.close()
+            self.db = None
+        _instances.discard(self)
+
+    def __del__(self):
+        if getattr(self, 'db', None) is not None:
+            self.close()
+
+
+def _after_fork():
+    for cache in list(_instances):
+        cache._after_fork()
+
+
+@atexit.register
+def _flush_all():
+    for cache in list(_instances):
+        cache.flush()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork)
@@ -0,0 +1,123 @@
+import json
+import numpy as np
+import dna_jellyfish as jellyfish
+from pyjellyfish.kmers import pack_kmers
+
+
+HEADER_DIGITS = 9
+BINARY_FORMAT = 'binary/sorted'
+
+
+def read_header(filename):
+    """Returns the JSON header of a Jellyfish file and the offset of the
+    data following it."""
+    with open(filename, 'rb') as fh:
+        digits = fh.read(HEADER_DIGITS)
+        if len(digits) != HEADER_DIGITS or not digits.isdigit():
+            raise ValueError("'%s' is not a Jellyfish file" % filename)
+        header_len = int(digits)
+        header = fh.read(header_len).rstrip(b'\0')
+    return json.loads(header), HEADER_DIGITS + header_len
+
+
+class RawMerFile:
+    """Memory-maps the records of a binary/sorted Jellyfish database
+    (the default `jellyfish count` output) as numpy arrays.
+
+    Records have a fixed width, a little-endian key of 2 bits per base
+    followed by a little-endian counter, so any range of them can be
+    decoded in bulk and ranges can be processed independently. Keys use
+    the same codes as Kmer.fwd.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.header, offset = read_header(filename)
+        if self.header.get('format') != BINARY_FORMAT:
+            raise ValueError(
+                "'%s' has format '%s', only '%s' can be mapped"
+                % (filename, self.header.get('format'), BINARY_FORMAT)
+            )
+        self.k = self.header['key_len'] // 2
+        self.key_bytes = (self.header['key_len'] + 7) // 8
+        self.val_bytes = self.header['counter_len']
+        self.record_len = self.key_bytes + self.val_bytes
+        data = np.memmap(filename, dtype=np.uint8, mode='r', offset=offset)
+        self.size = len(data) // self.record_len
+        self.records = data[:self.size * self.record_len].reshape(
+            self.size, self.record_len
+        )
+
+    @staticmethod
+    def is_binary(filename):
+        try:
+            header, offset = read_header(filename)
+        except (OSError, ValueError):
+            return False
+        return header.get('format') == BINARY_FORMAT
+
+    def __len__(self):
+        return self.size
+
+    def counts(self, start=0, stop=None):
+        """Returns the counts of records [start, stop) as uint64."""
+        return _little_endian(
+            self.records[start:stop, self.key_bytes:], self.val_bytes
+        )
+
+    def codes(self, start=0, stop=None):
+        """Returns the k-mer codes of records [start, stop) as uint64."""
+        if self.key_bytes > 8:
+            raise ValueError('cannot decode k-mers of k=%d > 32' % self.k)
+        return _little_endian(
+            self.records[start:stop, :self.key_bytes], self.key_bytes
+        )
+
+    def ranges(self, n, chunk_size=None):
+        """Splits the records in `n` contiguous ranges, themselves split
+        in ranges of at most `chunk_size` records."""
+        bounds = np.linspace(0, self.size, n + 1).astype(int).tolist()
+        ranges = []
+        for start, stop in zip(bounds, bounds[1:]):
+            step = chunk_size or max(stop - start, 1)
+            ranges.extend(
+                (i, min(i + step, stop)) for i in range(start, stop, step)
+            )
+        return ranges
+
+
+def read_chunks(filename, chunk_size, encode=True):
+    """Streams a Jellyfish database of any format with ReadMerFile,
+    yielding the k-mer codes and the counts of its records as uint64
+    arrays of at most `chunk_size` records, the last one possibly empty.
+
+    With `encode=False` the k-mers are yielded as a list of strings
+    instead, which works for any k.
+    """
+    # the iterator of a ReadMerFile does not own it: it must outlive the
+    # loop
+    reader = jellyfish.ReadMerFile(filename)
+    k = jellyfish.MerDNA.k()
+    kmers = []
+    counts = []
+    for mer, count in reader:
+        kmers.append(str(mer))
+        counts.append(count)
+        if len(kmers) == chunk_size:
+            yield _chunk(kmers, counts, k, encode)
+            kmers = []
+            counts = []
+    yield _chunk(kmers, counts, k, encode)
+
+
+def _chunk(kmers, counts, k, encode):
+    counts = np.array(counts, dtype=np.uint64)
+    if encode:
+        return pack_kmers(kmers, k)[0], counts
+    return kmers, counts
+
+
+def _little_endian(columns, nbytes):
+    padded = np.zeros((len(columns), 8), dtype=np.uint8)
+    padded[:, :nbytes] = columns
+    return padded.view('<u8').ravel()
@@ -0,0 +1,170 @@
+import numpy as np
+from pyjellyfish.BloomFilter import MASK64, _mix64, _mix64_array
+
+
+METRICS = ('jaccard', 'containment', 'weighted_jaccard')
+
+# saved sketches of an older version are rebuilt rather than loaded
+VERSION = 2
+
+
+def hash_codes(codes, seed):
+    """Hashes k-mer codes with a seeded splitmix64 finalizer, which is a
+    bijection: distinct k-mers never collide."""
+    salt = np.uint64(_mix64(seed & MASK64))
+    return _mix64_array(np.asarray(codes, dtype=np.uint64) ^ salt)
+
+
+class Sketch:
+    """Bottom-k MinHash sketch: the `size` smallest hashes of the k-mers
+    of a database, sorted, next to their counts.
+
+    Sketches made with the same seed and k are compared on the hashes
+    below the smaller of their largest hashes, where both are complete,
+    giving estimates of the Jaccard index, of the containment and, from
+    the counts, of the count-weighted Jaccard index.
+    """
+
+    def __init__(self, hashes, counts, size, seed, k):
+        self.hashes = np.asarray(hashes, dtype=np.uint64)
+        self.counts = np.asarray(counts, dtype=np.uint64)
+        self.size = size
+        self.seed = seed
+        self.k = k
+
+    @classmethod
+    def from_codes(cls, codes, counts, size, seed, k):
+        """Returns the sketch of k-mer codes and their counts. Repeated
+        codes, such as a k-mer and its reverse complement once
+        canonicalized, are counted once with their counts summed."""
+        hashes = hash_codes(codes, seed)
+        counts = np.asarray(counts, dtype=np.uint64)
+        return cls(*_bottom(hashes, counts, size), size, seed, k)
+
+    @classmethod
+    def merge(cls, sketches):
+        """Returns the sketch of the union of the k-mers of sketches
+        made with the same parameters, such as those of chunks."""
+        sketches = list(sketches)
+        first = sketches[0]
+        hashes, counts = _bottom(
+            np.concatenate([s.hashes for s in sketches]),
+            np.concatenate([s.counts for s in sketches]),
+            first.size
+        )
+        return cls(hashes, counts, first.size, first.seed, first.k)
+
+    def __len__(self):
+        return len(self.hashes)
+
+    @property
+    def threshold(self):
+        """Largest hash below which the sketch holds every hash."""
+        if len(self.hashes) < self.size:
+            return np.uint64(MASK64)
+        return self.hashes[-1]
+
+    def _check(self, other):
+        if (self.seed, self.k) != (other.seed, other.k):
+            raise ValueError(
+                'cannot compare sketches of seed %d, k=%s and seed %d, k=%s'
+                % (self.seed, self.k, other.seed, other.k)
+            )
+
+    def _common(self, other):
+        """Returns both sketches cut at the common threshold and the mask
+        of the hashes of the first found in the second."""
+        self._check(other)
+        threshold = min(self.threshold, other.threshold)
+        a = self.hashes[:np.searchsorted(self.hashes, threshold, 'right')]
+        b = other.hashes[:np.searchsorted(other.hashes, threshold, 'right')]
+        if not len(b):
+            return a, b, np.zeros(len(a), dtype=bool)
+        idx = np.searchsorted(b, a)
+        idx[idx == len(b)] = 0
+        return a, b, b[idx] == a
+
+    def jaccard(self, other):
+        a, b, common = self._common(other)
+        union = len(a) + len(b) - int(common.sum())
+        return int(common.sum()) / union if union else 0.0
+
+    def containment(self, other):
+        """Estimated fraction of the k-mers of this sketch's database
+        found in the database of `other`."""
+        a, b, common = self._common(other)
+        return int(common.sum()) / len(a) if len(a) else 0.0
+
+    def weighted_jaccard(self, other):
+        """Estimated sum of the minimum over the sum of the maximum count
+        of every k-mer in either database."""
+        a, b, common = self._common(other)
+        union = np.union1d(a, b)
+        counts_a = np.zeros(len(union), dtype=np.uint64)
+        counts_b = np.zeros(len(union), dtype=np.uint64)
+        counts_a[np.searchsorted(union, a)] = self.counts[:len(a)]
+        counts_b[np.searchsorted(union, b)] = other.counts[:len(b)]
+        total = int(np.maximum(counts_a, counts_b).sum())
+        if not total:
+            return 0.0
+        return int(np.minimum(counts_a, counts_b).sum()) / total
+
+    def save(self, path, **metadata):
+        with open(path, 'wb') as fh:
+            np.savez(
+                fh, hashes=self.hashes, counts=self.counts, size=self.size,
+                seed=self.seed, k=self.k, **metadata
+            )
+
+    @classmethod
+    def load(cls, path):
+        """Returns the sketch saved at `path` and its metadata."""
+        with np.load(path) as data:
+            sketch = cls(
+                data['hashes'], data['counts'], int(data['size']),
+                int(data['seed']), int(data['k'])
+            )
+            metadata = {
+                key: data[key].item() for key in data.files
+                if key not in ('hashes', 'counts', 'size', 'seed', 'k')
+            }
+        return sketch, metadata
+
+
+def _bottom(hashes, counts, size):
+    """Returns the `size` smallest distinct hashes, sorted, and their
+    summed counts."""
+    hashes, inverse = np.unique(hashes, return_inverse=True)
+    counts = np.bincount(
+        inverse.ravel(), weights=counts, minlength=len(hashes)
+    ).astype(np.uint64)
+    return hashes[:size], counts[:size]
+
+
+def compare(sketches, metric='jaccard'):
+    """Returns the matrix of `metric` between every pair of sketches,
+    given as Sketch instances or paths of saved sketches.
+
+    `metric` is 'jaccard', 'containment', where cell (i, j) is the
+    fraction of the k-mers of i found in j, or 'weighted_jaccard'.
+    """
+    if metric not in METRICS:
+        raise ValueError(
+            "unknown metric '%s', expected one of %s"
+            % (metric, ', '.join(METRICS))
+        )
+    sketches = [
+        s if isinstance(s, Sketch) else Sketch.load(s)[0] for s in sketches
+    ]
+    n = len(sketches)
+    matrix = np.zeros((n, n))
+    for i in range(n):
+        for j in range(i, n):
+            if metric == 'containment':
+                matrix[i, j] = sketches[i].containment(sketches[j])
+                matrix[j, i] = sketches[j].containment(sketches[i])
+            else:
+                matrix[i, j] = matrix[j, i] = getattr(
+                    sketches[i], metric
+                )(sketches[j])
+    return matrix
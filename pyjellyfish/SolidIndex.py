@@ -0,0 +1,229 @@
+import json
+import struct
+import numpy as np
+import dna_jellyfish as jellyfish
+from pyjellyfish.Kmer import decode, encode
+from pyjellyfish.RawMerFile import RawMerFile, read_chunks
+
+
+MAGIC = b'PYJFIDX1'
+CHUNK_SIZE = 1 << 20
+BLOCK_SIZE = 256
+HEADER_FIELDS = (
+    'k', 'min_count', 'max_count', 'size', 'key_dtype', 'count_dtype',
+    'block_size', 'n_fences'
+)
+
+_UNSIGNED = ('<u1', '<u2', '<u4', '<u8')
+
+
+class SolidIndex:
+    """Read-only index of the k-mers of a database whose count is at
+    least `min_count`.
+
+    K-mers are stored as sorted 2-bit integer codes next to their counts
+    and the file is memory-mapped, so opening it does not read it. Codes
+    take the narrowest integer holding 2k bits and counts the narrowest
+    holding the largest count, or `max_count` when counts were capped.
+    Every BLOCK_SIZE-th code is also kept in a small sparse index read
+    at opening, so a lookup searches it in memory and then a single
+    block of the mapped codes, touching one or two pages. K-mers below
+    `min_count` are reported with a count of 0.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        with open(filename, 'rb') as fh:
+            if fh.read(len(MAGIC)) != MAGIC:
+                raise ValueError("'%s' is not a k-mer index" % filename)
+            (header_len,) = struct.unpack('<Q', fh.read(8))
+            self.header = json.loads(fh.read(header_len))
+        missing = [f for f in HEADER_FIELDS if f not in self.header]
+        if missing:
+            raise ValueError(
+                "'%s' has no %s in its header, rebuild it with python -m "
+                "pyjellyfish.index" % (filename, ', '.join(missing))
+            )
+        self.k = self.header['k']
+        self.min_count = self.header['min_count']
+        self.max_count = self.header['max_count']
+        self.size = self.header['size']
+        key_dtype = np.dtype(self.header['key_dtype'])
+        count_dtype = np.dtype(self.header['count_dtype'])
+        self.block_size = self.header['block_size']
+        n_fences = self.header['n_fences']
+
+        offset = _align(len(MAGIC) + 8 + header_len)
+        with open(filename, 'rb') as fh:
+            fh.seek(offset)
+            self.fences = np.frombuffer(
+                fh.read(8 * n_fences), dtype='<u8'
+            ).astype(np.uint64)
+        offset += 8 * n_fences
+        if self.size:
+            self.codes = np.memmap(
+                filename, dtype=key_dtype, mode='r',
+                offset=offset, shape=(self.size,)
+            )
+            offset = _align(offset + key_dtype.itemsize * self.size)
+            self.counts = np.memmap(
+                filename, dtype=count_dtype, mode='r',
+                offset=offset, shape=(self.size,)
+            )
+        else:
+            self.codes = np.zeros(0, dtype=key_dtype)
+            self.counts = np.zeros(0, dtype=count_dtype)
+        jellyfish.MerDNA.k(self.k)
+
+    @staticmethod
+    def is_index(filename):
+        with open(filename, 'rb') as fh:
+            return fh.read(len(MAGIC)) == MAGIC
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, mer):
+        """Returns the count of a MerDNA, as QueryMerFile does."""
+        return self.count(encode(str(mer)))
+
+    def _block(self, code):
+        """Returns the bounds of the block of codes that may hold `code`."""
+        start = max(int(np.searchsorted(self.fences, code, 'right')) - 1, 0)
+        start *= self.block_size
+        return start, min(start + self.block_size, self.size)
+
+    def count(self, code):
+        """Returns the count of the k-mer of integer code `code`."""
+        if not self.size or code >= 1 << 2 * self.k:
+            return 0
+        start, stop = self._block(np.uint64(code))
+        block = self.codes[start:stop]
+        code = block.dtype.type(code)
+        i = int(np.searchsorted(block, code))
+        if i < len(block) and block[i] == code:
+            return int(self.counts[start + i])
+        return 0
+
+    def count_many(self, codes):
+        """Returns the counts of an array of integer codes, searched by
+        a vectorized binary search within their blocks."""
+        codes = np.asarray(codes, dtype=np.uint64)
+        counts = np.zeros(len(codes), dtype=np.uint32)
+        if not self.size or not len(codes):
+            return counts
+        if self.k < 32:
+            valid = codes < np.uint64(1 << 2 * self.k)
+            codes = codes[valid]
+        else:
+            valid = slice(None)
+        keys = codes.astype(self.codes.dtype)
+        lo = np.searchsorted(self.fences, codes, 'right').astype(np.intp)
+        lo = np.maximum(lo - 1, 0) * self.block_size
+        hi = np.minimum(lo + self.block_size, self.size)
+        last = self.size - 1
+        while True:
+            active = lo < hi
+            if not active.any():
+                break
+            mid = (lo + hi) >> 1
+            less = self.codes[np.minimum(mid, last)] < keys
+            lo = np.where(active & less, mid + 1, lo)
+            hi = np.where(active & ~less, mid, hi)
+        pos = np.minimum(lo, last)
+        found = self.codes[pos] == keys
+        found_counts = np.zeros(len(codes), dtype=np.uint32)
+        found_counts[found] = self.counts[pos[found]]
+        counts[valid] = found_counts
+        return counts
+
+    def __iter__(self):
+        """Yields (k-mer string, count) pairs in sorted order."""
+        for code, count in zip(self.codes, self.counts):
+            yield decode(int(code), self.k), int(count)
+
+    @classmethod
+    def build(cls, filename, output, min_count=1, max_count=None):
+        """Streams a Jellyfish database and writes the index of its k-mers
+        with a count of at least `min_count` to `output`, capping counts
+        at `max_count`.
+
+        Binary databases are memory-mapped in chunks with RawMerFile and
+        other formats read with ReadMerFile."""
+        codes = [np.zeros(0, dtype=np.uint64)]
+        counts = [np.zeros(0, dtype=np.uint64)]
+        if RawMerFile.is_binary(filename):
+            raw = RawMerFile(filename)
+            k = raw.k
+            for start, stop in raw.ranges(1, CHUNK_SIZE):
+                chunk_counts = raw.counts(start, stop)
+                keep = chunk_counts >= min_count
+                codes.append(raw.codes(start, stop)[keep])
+                counts.append(chunk_counts[keep])
+        else:
+            for chunk_codes, chunk_counts in read_chunks(filename, CHUNK_SIZE):
+                keep = chunk_counts >= min_count
+                codes.append(chunk_codes[keep])
+                counts.append(chunk_counts[keep])
+            k = jellyfish.MerDNA.k()
+
+        return cls.write(
+            output, k, np.concatenate(codes), np.concatenate(counts),
+            min_count, filename, max_count
+        )
+
+    @classmethod
+    def write(cls, output, k, codes, counts, min_count=1, source=None,
+              max_count=None):
+        """Writes the index of k-mer codes and their counts to `output`.
+        The codes need not be sorted but must be distinct. Counts above
+        `max_count` are stored as `max_count`."""
+        if k > 32:
+            raise ValueError('cannot index k-mers of k=%d > 32' % k)
+        codes = np.asarray(codes, dtype=np.uint64)
+        order = np.argsort(codes, kind='stable')
+        codes = codes[order]
+        counts = np.asarray(counts, dtype=np.uint64)[order]
+        cap = np.iinfo(np.uint32).max
+        if max_count is not None:
+            cap = min(max_count, cap)
+        counts = np.minimum(counts, cap)
+        key_dtype = _narrowest(2 * k)
+        count_dtype = _narrowest(
+            int(counts.max()).bit_length() if len(counts) else 1
+        )
+        fences = codes[::BLOCK_SIZE]
+
+        header = json.dumps({
+            'k': k,
+            'min_count': min_count,
+            'max_count': max_count,
+            'size': len(codes),
+            'source': source,
+            'key_dtype': key_dtype,
+            'count_dtype': count_dtype,
+            'block_size': BLOCK_SIZE,
+            'n_fences': len(fences),
+        }).encode()
+        with open(output, 'wb') as fh:
+            fh.write(MAGIC)
+            fh.write(struct.pack('<Q', len(header)))
+            fh.write(header)
+            fh.write(b'\0' * (_align(fh.tell()) - fh.tell()))
+            fh.write(fences.astype('<u8').tobytes())
+            fh.write(codes.astype(key_dtype).tobytes())
+            fh.write(b'\0' * (_align(fh.tell()) - fh.tell()))
+            fh.write(counts.astype(count_dtype).tobytes())
+        return cls(output)
+
+
+def _narrowest(bits):
+    """Returns the narrowest unsigned little-endian dtype of `bits` bits."""
+    for dtype in _UNSIGNED:
+        if bits <= 8 * np.dtype(dtype).itemsize:
+            return dtype
+    raise ValueError('no integer type of %d bits' % bits)
+
+
+def _align(offset, alignment=8):
+    return (offset + alignment - 1) // alignment * alignment
@@ -1,3 +1,57 @@
 __version__ = '1.3.1'
 
-from pyjellyfish.Jellyfish import Jellyfish
+import importlib
+import sys
+import types
+
+
+_EXPORTS = {
+    'Jellyfish': 'pyjellyfish.Jellyfish',
+    'JellyfishCollection': 'pyjellyfish.JellyfishCollection',
+    'JellyfishClient': 'pyjellyfish.JellyfishClient',
+    'Sketch': 'pyjellyfish.Sketch',
+    'compare': 'pyjellyfish.Sketch',
+    'count': 'pyjellyfish.counting',
+    'diff': 'pyjellyfish.differential',
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    """Imports the public names on first use, so that importing the
+    package, as the command line tools do, does not load dna_jellyfish
+    and numpy."""
+    if name not in _EXPORTS:
+        raise AttributeError(
+            "module '%s' has no attribute '%s'" % (__name__, name)
+        )
+    value = getattr(importlib.import_module(_EXPORTS[name]), name)
+    globals()[name] = value
+    return value
+
+
+def build_info():
+    """Returns the jellyfish version and the optimization profile the
+    package was built with, or None when it was not built by setup.py."""
+    try:
+        from pyjellyfish._build import BUILD_INFO
+    except ImportError:
+        return None
+    return dict(BUILD_INFO)
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
+
+
+class _Package(types.ModuleType):
+    def __setattr__(self, name, value):
+        # importing the pyjellyfish.Jellyfish module must not shadow the
+        # Jellyfish class it defines
+        if name in _EXPORTS and isinstance(value, types.ModuleType):
+            return
+        super().__setattr__(name, value)
+
+
+sys.modules[__name__].__class__ = _Package
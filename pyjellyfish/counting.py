@@ -0,0 +1,110 @@
+import os
+import numpy as np
+import dna_jellyfish as jellyfish
+from pyjellyfish.fastx import read_fastx
+from pyjellyfish.Jellyfish import Jellyfish
+from pyjellyfish.Kmer import decode
+from pyjellyfish.kmers import pack
+from pyjellyfish.SolidIndex import SolidIndex
+
+
+VAL_LEN = 7
+
+
+class CountedJellyfish(Jellyfish):
+    """Jellyfish front-end over k-mers counted in memory by `count`."""
+
+    def __init__(self, counter, cutoff=0.30, n_cutoff=500, canonical=True,
+                 cache_size=0):
+        self.counter = counter
+        super().__init__(None, cutoff, n_cutoff, canonical, cache_size)
+
+    def _read_header(self):
+        self.index = None
+        self.k = jellyfish.MerDNA.k()
+        self.header = {'key_len': 2 * self.k, 'canonical': self.canonical}
+        self.counter_len = None
+        self.counted_canonical = self.canonical
+
+    def _open(self):
+        self._jf = _CounterQuery(self.counter)
+
+
+class _CounterQuery:
+    """Reports absent k-mers of a HashCounter as 0, as QueryMerFile does."""
+
+    def __init__(self, counter):
+        self.get = counter.get
+
+    def __getitem__(self, mer):
+        count = self.get(mer)
+        return 0 if count is None else count
+
+
+def count(inputs, k, size=1 << 20, canonical=True, output=None,
+          cutoff=0.30, n_cutoff=500, cache_size=0, threads=1):
+    """Counts the k-mers of sequences or FASTA/FASTQ files in memory.
+
+    `inputs` is a sequence, a path or an iterable of both; paths may be
+    gzipped and are read record by record. K-mers are counted in a
+    native HashCounter, initially of `size` entries and doubled as
+    needed, and only their canonical form is counted when `canonical`
+    is true, as `jellyfish count -C` does. K-mers containing a base
+    other than A, C, G or T are skipped.
+
+    Returns a CountedJellyfish answering the same queries as Jellyfish.
+    With `output`, the counted k-mers are also written to that path as
+    a SolidIndex, which Jellyfish can open later; the inputs are then
+    read twice. Note that this sets the k of every MerDNA in the process.
+
+    Counting is single-threaded and `threads` must be 1: every thread
+    would have to take part in the resizes of the HashCounter, which the
+    binding does not allow, and its calls hold the GIL anyway.
+    """
+    if threads != 1:
+        raise ValueError(
+            'in-process counting is single-threaded, got threads=%d; use '
+            '`jellyfish count -t` to count with threads' % threads
+        )
+    if isinstance(inputs, (str, os.PathLike)):
+        inputs = [inputs]
+    if output is not None:
+        inputs = list(inputs)
+
+    jellyfish.MerDNA.k(k)
+    counter = jellyfish.HashCounter(size, VAL_LEN)
+    string_mers = (
+        jellyfish.string_canonicals if canonical else jellyfish.string_mers
+    )
+    add = counter.add
+    for seq in _sequences(inputs):
+        # the iterator of a StringMers, and the MerDNA it yields, do not
+        # own it: it must outlive the loop
+        mers = string_mers(seq)
+        for mer in mers:
+            add(mer, 1)
+
+    if output is not None:
+        codes = np.unique(np.concatenate([np.zeros(0, dtype=np.uint64)] + [
+            codes[valid]
+            for codes, valid in (
+                pack(seq, k, canonical) for seq in _sequences(inputs)
+            )
+        ]))
+        mer = jellyfish.MerDNA()
+        counts = np.zeros(len(codes), dtype=np.uint64)
+        for i, code in enumerate(codes.tolist()):
+            mer.set(decode(code, k))
+            counts[i] = counter[mer]
+        SolidIndex.write(output, k, codes, counts)
+
+    return CountedJellyfish(counter, cutoff, n_cutoff, canonical, cache_size)
+
+
+def _sequences(inputs):
+    for item in inputs:
+        if isinstance(item, os.PathLike) or os.path.isfile(item):
+            for name, seq in read_fastx(item):
+                yield seq
+        else:
+            yield item
@@ -0,0 +1,91 @@
+from collections import deque
+import numpy as np
+from pyjellyfish.Jellyfish import (
+    SCAN_CHUNK_SIZE, Jellyfish, _init_worker, _pool_context, _worker_run
+)
+from pyjellyfish.Kmer import decode
+from pyjellyfish.kmers import MAX_K
+from pyjellyfish.RawMerFile import RawMerFile, read_chunks, read_header
+
+
+def diff(a, b, min_a=2, max_b=0, output=None, canonical=True, processes=0,
+         chunk_size=SCAN_CHUNK_SIZE):
+    """Streams the k-mers seen at least `min_a` times in database `a`
+    and at most `max_b` times in database `b`.
+
+    Both databases must have been counted with the same k. Database `a`
+    is read sequentially, memory-mapped in ranges of `chunk_size`
+    records when it is a binary database of k <= 32 and with ReadMerFile
+    otherwise, and the k-mers passing `min_a` are looked up
+    in `b` in batches. `b` is opened once per call and released when
+    the call is done. With `processes`, ranges are handled by a pool of
+    workers, which receive `b` when they start, with at most two ranges
+    in flight per worker.
+
+    Returns a generator of (k-mer, count in a, count in b) tuples or,
+    with `output`, writes them to that path as tab-separated lines and
+    returns how many were written.
+    """
+    k = read_header(a)[0]['key_len'] // 2
+    db_b = Jellyfish(b, canonical=canonical)
+    if k != db_b.k:
+        raise ValueError(
+            'databases do not share the same k: %s (k=%d), %s (k=%d)'
+            % (a, k, b, db_b.k)
+        )
+    matches = _diff(a, db_b, k, min_a, max_b, processes, chunk_size)
+    if output is None:
+        return matches
+    n = 0
+    with open(output, 'w') as fh:
+        for kmer, count_a, count_b in matches:
+            fh.write('%s\t%d\t%d\n' % (kmer, count_a, count_b))
+            n += 1
+    return n
+
+
+def _diff(a, db_b, k, min_a, max_b, processes, chunk_size):
+    if k > MAX_K or not RawMerFile.is_binary(a):
+        for kmers, counts in read_chunks(a, chunk_size, encode=False):
+            keep = np.flatnonzero(counts >= min_a).tolist()
+            yield from _diff_chunk(
+                db_b, [kmers[i] for i in keep], counts[keep].tolist(), max_b
+            )
+        return
+
+    args = [
+        (a, start, stop, min_a, max_b)
+        for start, stop in RawMerFile(a).ranges(1, chunk_size)
+    ]
+    if not processes:
+        for x in args:
+            yield from _diff_range(db_b, *x)
+        return
+    with _pool_context().Pool(processes, _init_worker, (db_b,)) as pool:
+        pending = deque()
+        for x in args:
+            pending.append(
+                pool.apply_async(_worker_run, (_diff_range,) + x)
+            )
+            if len(pending) >= 2 * processes:
+                yield from pending.popleft().get()
+        while pending:
+            yield from pending.popleft().get()
+
+
+def _diff_chunk(db_b, kmers, counts_a, max_b):
+    counts_b = db_b.query_many(kmers)
+    return [
+        (kmer, count_a, count_b)
+        for kmer, count_a, count_b in zip(kmers, counts_a, counts_b.tolist())
+        if count_b <= max_b
+    ]
+
+
+def _diff_range(db_b, a, start, stop, min_a, max_b):
+    raw = RawMerFile(a)
+    counts = raw.counts(start, stop)
+    keep = np.flatnonzero(counts >= min_a)
+    codes = raw.codes(start, stop)[keep].tolist()
+    kmers = [decode(code, raw.k) for code in codes]
+    return _diff_chunk(db_b, kmers, counts[keep].tolist(), max_b)
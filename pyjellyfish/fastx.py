@@ -0,0 +1,55 @@
+import gzip
+
+
+GZIP_MAGIC = b'\x1f\x8b'
+
+
+def open_fastx(path):
+    """Opens a FASTA/FASTQ file for reading as text, gzipped or not."""
+    with open(path, 'rb') as fh:
+        gzipped = fh.read(2) == GZIP_MAGIC
+    if gzipped:
+        return gzip.open(path, 'rt')
+    return open(path, 'r')
+
+
+def read_fastx(path):
+    """Yields the (name, sequence) records of a FASTA or FASTQ file,
+    telling them apart by the first character of the file."""
+    with open_fastx(path) as fh:
+        line = fh.readline()
+        if line.startswith('@'):
+            yield from _read_fastq(fh, line)
+        else:
+            yield from _read_fasta(fh, line)
+
+
+def _name(header):
+    fields = header[1:].split(None, 1)
+    return fields[0] if fields else ''
+
+
+def _read_fasta(fh, line):
+    name = None
+    seq = []
+    while line:
+        if line.startswith('>'):
+            if name is not None:
+                yield name, ''.join(seq)
+            name = _name(line)
+            seq = []
+        elif name is not None:
+            seq.append(line.strip())
+        line = fh.readline()
+    if name is not None:
+        yield name, ''.join(seq)
+
+
+def _read_fastq(fh, line):
+    while line:
+        if line.startswith('@'):
+            seq = fh.readline().strip()
+            fh.readline()
+            fh.readline()
+            yield _name(line), seq
+        line = fh.readline()
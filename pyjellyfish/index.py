@@ -0,0 +1,42 @@
+"""Writes the index of the solid k-mers of a Jellyfish database.
+
+Usage: python -m pyjellyfish.index db.jf db.jfi --min-count 500
+
+Only k-mers with a count of at least --min-count are kept, and counts
+above --max-count are stored as --max-count, which lets them take fewer
+bytes. The index is a compact, memory-mapped file that can be opened
+with `Jellyfish('db.jfi')` in place of the database.
+"""
+
+import argparse
+import os
+
+from pyjellyfish.SolidIndex import SolidIndex
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog='python -m pyjellyfish.index',
+        description='Writes the index of the solid k-mers of a Jellyfish '
+                    'database.'
+    )
+    parser.add_argument('jf', help='jellyfish database')
+    parser.add_argument('output', help='index file to write')
+    parser.add_argument('--min-count', type=int, default=1,
+                        help='minimum count of the indexed k-mers '
+                             '(default: 1)')
+    parser.add_argument('--max-count', type=int, default=None,
+                        help='cap of the stored counts (default: none)')
+    args = parser.parse_args()
+
+    index = SolidIndex.build(
+        args.jf, args.output, args.min_count, args.max_count
+    )
+    print('%d k-mers with count >= %d written to %s (%d bytes, %d for %s)'
+          % (len(index), args.min_count, args.output,
+             os.path.getsize(args.output), os.path.getsize(args.jf),
+             args.jf))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+"""Vectorized 2-bit packing of k-mers (k <= 32) into uint64 arrays.
+
+Codes are those of Kmer.fwd and of SolidIndex: 2 bits per base (A=0,
+C=1, G=2, T=3), the last base in the lowest bits. Functions return the
+codes along with a mask of the valid k-mers, those made only of A, C, G
+and T, the codes of invalid ones being 0.
+"""
+
+import numpy as np
+
+
+MAX_K = 32
+
+_BASE_CODES = np.full(256, 4, dtype=np.uint8)
+for _code, _base in enumerate(b'ACGT'):
+    _BASE_CODES[_base] = _BASE_CODES[_base + 32] = _code
+_BASES = np.frombuffer(b'ACGT', dtype=np.uint8)
+
+_M1 = np.uint64(0x3333333333333333)
+_M2 = np.uint64(0x0F0F0F0F0F0F0F0F)
+
+
+def _check_k(k):
+    if not 0 < k <= MAX_K:
+        raise ValueError('cannot pack k-mers of k=%d in 64 bits' % k)
+
+
+def _as_bytes(seq):
+    """Returns a sequence as a uint8 array of its ASCII characters."""
+    if isinstance(seq, np.ndarray):
+        if seq.dtype != np.uint8:
+            raise TypeError('unsupported sequence dtype %s' % seq.dtype)
+        return seq.ravel()
+    if isinstance(seq, str):
+        seq = seq.encode('ascii')
+    return np.frombuffer(seq, dtype=np.uint8)
+
+
+def _pack_columns(bases, k):
+    """Packs a (n, k) array of base codes into n uint64 codes."""
+    codes = np.zeros(len(bases), dtype=np.uint64)
+    two = np.uint64(2)
+    for j in range(k):
+        codes <<= two
+        codes |= bases[:, j] & 3
+    return codes
+
+
+def _rolling_codes(bases, k):
+    """Packs every window of k bases of an array of base codes, merging
+    windows of doubling lengths (log2(k) passes rather than k)."""
+    codes = None
+    length = 0
+    windows = (bases & 3).astype(np.uint64)
+    width = 1
+    while True:
+        if k & width:
+            if codes is None:
+                codes = windows
+            else:
+                n = len(bases) - length - width + 1
+                codes = (
+                    (codes[:n] << np.uint64(2 * width))
+                    | windows[length:length + n]
+                )
+            length += width
+        width <<= 1
+        if width > k:
+            return codes
+        n = len(windows) - width // 2
+        windows = (windows[:n] << np.uint64(width)) | windows[width // 2:]
+
+
+def pack(seq, k, canonical=False):
+    """Returns the codes of the len(seq) - k + 1 k-mers along `seq` (a
+    str, bytes or uint8 array) and the mask of those without N."""
+    _check_k(k)
+    bases = _BASE_CODES[_as_bytes(seq)]
+    n = len(bases) - k + 1
+    if n <= 0:
+        return np.zeros(0, dtype=np.uint64), np.zeros(0, dtype=bool)
+    invalid = np.concatenate(([0], np.cumsum(bases == 4)))
+    valid = invalid[k:] == invalid[:n]
+    codes = _rolling_codes(bases, k)
+    if canonical:
+        codes = canonicalize(codes, k)
+    codes[~valid] = 0
+    return codes, valid
+
+
+def pack_kmers(kmers, k, canonical=False):
+    """Returns the codes of many k-mers and the mask of those without N.
+
+    `kmers` takes the forms accepted by `Jellyfish.query_many`: an
+    iterable of k-mer strings, a packed str, bytes or uint8 array of
+    concatenated k-mers, or a numpy array of fixed-width strings.
+    """
+    _check_k(k)
+    if isinstance(kmers, np.ndarray) and kmers.dtype.kind in 'US':
+        kmers = kmers.ravel()
+        lengths = np.char.str_len(kmers)
+        if len(kmers) and (lengths != k).any():
+            raise ValueError('k-mers are not all of length k=%d' % k)
+        buffer = kmers.astype('S%d' % k).view(np.uint8)
+    elif isinstance(kmers, (str, bytes, bytearray, memoryview, np.ndarray)):
+        buffer = _as_bytes(kmers)
+        if len(buffer) % k:
+            raise ValueError(
+                'packed k-mer buffer of length %d is not a multiple of k=%d'
+                % (len(buffer), k)
+            )
+    else:
+        if not isinstance(kmers, (list, tuple)):
+            kmers = list(kmers)
+        lengths = np.fromiter(map(len, kmers), dtype=np.intp,
+                              count=len(kmers))
+        if (lengths != k).any():
+            raise ValueError('k-mers are not all of length k=%d' % k)
+        buffer = _as_bytes(''.join(kmers))
+    bases = _BASE_CODES[buffer].reshape(-1, k)
+    valid = (bases != 4).all(axis=1)
+    codes = _pack_columns(bases, k)
+    if canonical:
+        codes = canonicalize(codes, k)
+    codes[~valid] = 0
+    return codes, valid
+
+
+def reverse_complement(codes, k):
+    """Returns the codes of the reverse complements of k-mer codes."""
+    _check_k(k)
+    x = ~np.asarray(codes, dtype=np.uint64)
+    # reverse the 2-bit bases within each byte, then the bytes
+    x = ((x >> np.uint64(2)) & _M1) | ((x & _M1) << np.uint64(2))
+    x = ((x >> np.uint64(4)) & _M2) | ((x & _M2) << np.uint64(4))
+    x = x.byteswap()
+    return x >> np.uint64(64 - 2 * k)
+
+
+def canonicalize(codes, k):
+    """Returns the smaller of each k-mer code and of its reverse
+    complement."""
+    codes = np.asarray(codes, dtype=np.uint64)
+    return np.minimum(codes, reverse_complement(codes, k))
+
+
+def unpack(codes, k):
+    """Returns k-mer codes as a numpy array of k-byte strings."""
+    _check_k(k)
+    codes = np.asarray(codes, dtype=np.uint64)
+    shifts = np.arange(2 * (k - 1), -1, -2, dtype=np.uint64)
+    bases = _BASES[(codes[:, None] >> shifts) & np.uint64(3)]
+    return np.ascontiguousarray(bases).view('S%d' % k).ravel()
@@ -0,0 +1,208 @@
+"""Serves a Jellyfish database over a Unix socket.
+
+Usage: python -m pyjellyfish.serve db.jf --socket /tmp/db.sock
+
+The database is loaded once and queried by any number of
+`JellyfishClient`. Requests are newline-delimited JSON objects of the
+form {"method": ..., "args": [...]}, answered in order on each
+connection by {"result": ...} or {"error": ...}. The socket of a server
+that is no longer running is replaced, but any other file at the
+--socket path is left alone and the server exits. Lookups arriving within
+`batch_delay` seconds of each other are merged into a single
+`Jellyfish.query_many` call.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import stat
+import sys
+
+from pyjellyfish.Jellyfish import Jellyfish
+
+
+STREAM_LIMIT = 1 << 28
+
+
+class Batcher:
+    """Merges concurrent k-mer lookups into batched query_many calls."""
+
+    def __init__(self, db, batch_delay=0.001, max_batch=100000):
+        self.db = db
+        self.batch_delay = batch_delay
+        self.max_batch = max_batch
+        self.pending = []
+        self.size = 0
+        self.handle = None
+
+    def submit(self, seqs):
+        future = asyncio.get_running_loop().create_future()
+        self.pending.append((seqs, future))
+        self.size += len(seqs)
+        if self.size >= self.max_batch:
+            self.flush()
+        elif self.handle is None:
+            self.handle = asyncio.get_running_loop().call_later(
+                self.batch_delay, self.flush
+            )
+        return future
+
+    def flush(self):
+        if self.handle is not None:
+            self.handle.cancel()
+            self.handle = None
+        pending, self.pending, self.size = self.pending, [], 0
+        seqs = [seq for batch, _ in pending for seq in batch]
+        try:
+            counts = self.db.query_many(seqs).tolist()
+        except Exception:
+            # retry one request at a time so that a malformed k-mer only
+            # fails the request it came from
+            for batch, future in pending:
+                try:
+                    future.set_result(self.db.query_many(batch).tolist())
+                except Exception as e:
+                    future.set_exception(e)
+            return
+        start = 0
+        for batch, future in pending:
+            future.set_result(counts[start:start + len(batch)])
+            start += len(batch)
+
+
+class Server:
+    """Answers JellyfishClient requests against one Jellyfish instance."""
+
+    def __init__(self, db, batch_delay=0.001, max_batch=100000):
+        self.db = db
+        self.batcher = Batcher(db, batch_delay, max_batch)
+        self.path = None
+
+    async def info(self):
+        return {
+            'filename': self.db.filename,
+            'k': self.db.k,
+            'canonical': self.db.canonical,
+            'cutoff': self.db.cutoff,
+            'n_cutoff': self.db.n_cutoff,
+        }
+
+    async def query(self, seq):
+        return (await self.batcher.submit([seq]))[0]
+
+    async def query_many(self, seqs):
+        return await self.batcher.submit(seqs)
+
+    async def get_child(self, seq, forward=True, cutoff=None, n_cutoff=None):
+        if cutoff is None:
+            cutoff = self.db.cutoff
+        if n_cutoff is None:
+            n_cutoff = self.db.n_cutoff
+        if forward:
+            child = [seq[1:] + c for c in 'ACGT']
+        else:
+            child = [c + seq[0:-1] for c in 'ACGT']
+        counts = await self.batcher.submit(child)
+        threshold = max(sum(counts) * cutoff, n_cutoff)
+        return [x for x, count in zip(child, counts) if count >= threshold]
+
+    async def coverage(self, seq):
+        return self.db.coverage(seq).tolist()
+
+    methods = ['info', 'query', 'query_many', 'get_child', 'coverage']
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                    if request['method'] not in self.methods:
+                        raise ValueError(
+                            'unknown method %r' % request['method']
+                        )
+                    method = getattr(self, request['method'])
+                    response = {
+                        'result': await method(*request.get('args', []))
+                    }
+                except Exception as e:
+                    response = {'error': '%s: %s' % (type(e).__name__, e)}
+                writer.write(json.dumps(response).encode() + b'\n')
+                await writer.drain()
+        finally:
+            writer.close()
+
+    async def serve(self, path):
+        remove_stale_socket(path)
+        server = await asyncio.start_unix_server(
+            self.handle, path, limit=STREAM_LIMIT
+        )
+        self.path = path
+        async with server:
+            await server.serve_forever()
+
+
+def remove_stale_socket(path):
+    """Removes the socket of a server that is no longer running at
+    `path`, raising FileExistsError if anything else is there."""
+    try:
+        mode = os.lstat(path).st_mode
+    except FileNotFoundError:
+        return
+    if not stat.S_ISSOCK(mode):
+        raise FileExistsError('%s exists and is not a socket' % path)
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+    except ConnectionRefusedError:
+        os.unlink(path)
+        return
+    finally:
+        sock.close()
+    raise FileExistsError('a server is already listening on %s' % path)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog='python -m pyjellyfish.serve',
+        description='Serves a Jellyfish database over a Unix socket.'
+    )
+    parser.add_argument('jf', help='jellyfish database')
+    parser.add_argument('--socket', required=True, help='Unix socket path')
+    parser.add_argument('--no-canonical', dest='canonical',
+                        action='store_false',
+                        help='query k-mers as given instead of canonical')
+    parser.add_argument('--cutoff', type=float, default=0.30,
+                        help='default get_child cutoff (default: 0.30)')
+    parser.add_argument('--n-cutoff', type=int, default=500,
+                        help='default get_child n_cutoff (default: 500)')
+    parser.add_argument('--batch-delay', type=float, default=0.001,
+                        help='seconds to wait for lookups to merge '
+                             '(default: 0.001)')
+    parser.add_argument('--max-batch', type=int, default=100000,
+                        help='k-mers per batch before flushing early '
+                             '(default: 100000)')
+    args = parser.parse_args()
+
+    # loaded before listening so that the first client does not wait
+    db = Jellyfish(args.jf, args.cutoff, args.n_cutoff, args.canonical)
+    db.preload()
+    server = Server(db, args.batch_delay, args.max_batch)
+    try:
+        asyncio.run(server.serve(args.socket))
+    except KeyboardInterrupt:
+        pass
+    except FileExistsError as e:
+        sys.exit('error: %s' % e)
+    finally:
+        # only the socket of this server is removed
+        if server.path is not None and os.path.exists(server.path):
+            os.unlink(server.path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""Files saved next to a database, such as its bloom filter or sketch,
+and reused while the database and the parameters they were made with are
+unchanged."""
+
+import os
+import tempfile
+
+
+def open_sidecar(cls, filename, suffix, build, valid=None, **params):
+    """Returns the `cls` object saved in `<filename><suffix>`, or the
+    one returned by `build()`, which is then saved there.
+
+    The saved object is used when it was made from the current database
+    (by size and modification time) with the same `params`, and when
+    `valid(obj)` holds if given. `cls` provides `load(path)`, returning
+    the object and its metadata, and objects `save(path, **metadata)`.
+    """
+    path = filename + suffix
+    st = os.stat(filename)
+    metadata = dict(
+        params, db_size=st.st_size, db_mtime_ns=st.st_mtime_ns
+    )
+    try:
+        obj, saved = cls.load(path)
+        if saved == metadata and (valid is None or valid(obj)):
+            return obj
+    except Exception:
+        # missing, truncated or otherwise unreadable files are rebuilt
+        pass
+    obj = build()
+    _save(obj, path, metadata)
+    return obj
+
+
+def _save(obj, path, metadata):
+    """Saves `obj` to a temporary file replacing `path` once complete,
+    so that readers never see a partial file. Failures are ignored: the
+    object is then rebuilt the next time."""
+    try:
+        fd, tmp = tempfile.mkstemp(
+            prefix=os.path.basename(path) + '.',
+            dir=os.path.dirname(os.path.abspath(path))
+        )
+    except OSError:
+        return
+    os.close(fd)
+    try:
+        obj.save(tmp, **metadata)
+        os.replace(tmp, path)
+    except OSError:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
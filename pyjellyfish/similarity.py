@@ -0,0 +1,65 @@
+"""Prints the similarity matrix of Jellyfish databases from their MinHash
+sketches.
+
+Usage: python -m pyjellyfish.similarity *.jf --size 1000 -p 8
+
+Each database is sketched by `Jellyfish.sketch`, which saves its sketch
+next to it as `<db>.sketch` so that later comparisons skip the scan.
+Rows and columns follow the order of the databases; with containment,
+cell (i, j) is the fraction of the k-mers of i found in j.
+"""
+
+import argparse
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from pyjellyfish.Jellyfish import Jellyfish
+from pyjellyfish.Sketch import METRICS, compare
+
+
+def _sketch(filename, size, seed, min_count, canonical):
+    return Jellyfish(filename, canonical=canonical).sketch(
+        size, seed, min_count
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog='python -m pyjellyfish.similarity',
+        description='Prints the similarity matrix of Jellyfish databases '
+                    'from their MinHash sketches.'
+    )
+    parser.add_argument('jf', nargs='+', help='jellyfish databases')
+    parser.add_argument('--size', type=int, default=1000,
+                        help='hashes kept per sketch (default: 1000)')
+    parser.add_argument('--seed', type=int, default=42,
+                        help='hash seed (default: 42)')
+    parser.add_argument('--min-count', type=int, default=1,
+                        help='minimum count of the sketched k-mers '
+                             '(default: 1)')
+    parser.add_argument('--metric', choices=METRICS, default='jaccard')
+    parser.add_argument('--no-canonical', dest='canonical',
+                        action='store_false',
+                        help='sketch k-mers as stored rather than canonical')
+    parser.add_argument('-p', '--processes', type=int, default=os.cpu_count(),
+                        help='databases sketched in parallel '
+                             '(default: number of CPUs)')
+    args = parser.parse_args()
+
+    n = len(args.jf)
+    with ProcessPoolExecutor(max(min(args.processes, n), 1)) as pool:
+        sketches = list(pool.map(
+            _sketch, args.jf, [args.size] * n, [args.seed] * n,
+            [args.min_count] * n, [args.canonical] * n
+        ))
+    matrix = compare(sketches, args.metric)
+
+    out = sys.stdout
+    out.write('\t'.join([''] + args.jf) + '\n')
+    for filename, row in zip(args.jf, matrix.tolist()):
+        out.write('\t'.join([filename] + ['%.4f' % x for x in row]) + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,14 @@
 #!/usr/bin/env python3
 
+import hashlib
+import json
 import os
+import shlex
+import shutil
 import sys
+import sysconfig
 import tarfile
+import tempfile
 from contextlib import contextmanager
 from distutils.command.build_scripts import build_scripts
 from distutils._modified import newer
@@ -18,6 +24,30 @@ from subprocess import CalledProcessError, check_output
 from wheel.bdist_wheel import bdist_wheel
 
 
+# compiler flags of the jellyfish build profiles; 'default' keeps the
+# flags chosen by jellyfish's configure script
+JF_PROFILES = {
+    'default': [],
+    'O3': ['-O3'],
+    'lto': ['-O3', '-flto'],
+    'native': ['-O3', '-march=native'],
+    'x86-64-v2': ['-O3', '-march=x86-64-v2'],
+    'x86-64-v3': ['-O3', '-march=x86-64-v3'],
+}
+
+BUILD_INFO_FILE = 'pyjellyfish/_build.py'
+
+# compiled jellyfish artifacts are kept here between builds; set it to an
+# empty string to always build from scratch
+JF_CACHE_DIR = os.environ.get(
+    'PYJELLYFISH_CACHE_DIR',
+    os.path.join(
+        os.environ.get('XDG_CACHE_HOME', os.path.expanduser('~/.cache')),
+        'pyjellyfish'
+    )
+)
+
+
 def safe_extract_tarfile(tarball, destination):
     with tarfile.open(tarball, 'r:gz') as tar:
         def is_within_directory(directory, target):
@@ -41,6 +71,18 @@ def safe_extract_tarfile(tarball, destination):
         safe_extract(tar, destination)
 
 
+def compiler_output(*args):
+    """Returns the output of the C++ compiler jellyfish is built with
+    given `args`, or None when it fails."""
+    try:
+        return check_output(
+            shlex.split(os.environ.get('CXX', 'g++')) + list(args),
+            universal_newlines=True
+        )
+    except (CalledProcessError, OSError):
+        return None
+
+
 def locate(pkg, extra_args=[]):
     try:
         output = check_output(extra_args + ['which', pkg], universal_newlines=True)
@@ -129,13 +171,31 @@ class JellyfishCommand(SuperCommand):
             'version=',
             None,
             'jellyfish version [2.2.10, 2.3.0] (default: 2.3.0)'
+        ), (
+            'profile=',
+            None,
+            'optimization profile [%s] (default: default)'
+            % ', '.join(JF_PROFILES)
+        ), (
+            'rebuild',
+            None,
+            'build jellyfish even if it is in the artifact cache'
         )]
 
+    boolean_options = ['rebuild']
+
     def initialize_options(self):
         self.version = None
+        self.profile = None
+        self.rebuild = None
 
     def finalize_options(self):
-        self.set_undefined_options('bdist_wheel', ('jf_version', 'version'))
+        self.set_undefined_options(
+            'bdist_wheel',
+            ('jf_version', 'version'),
+            ('jf_profile', 'profile'),
+            ('jf_rebuild', 'rebuild')
+        )
         # Jellyfish v2.3.1 has a merged PR that breaks compilation in setup.py:
         # https://github.com/gmarcais/Jellyfish/pull/169
         if self.version:
@@ -146,10 +206,142 @@ class JellyfishCommand(SuperCommand):
                     )
         else:
             self.version = '2.3.0'
+        if self.profile:
+            if self.profile not in JF_PROFILES:
+                raise OptionError(
+                        "error in jellyfish-profile option: accepted " +
+                        "profiles are " + ', '.join(JF_PROFILES)
+                    )
+        else:
+            self.profile = 'default'
+
+    def flags(self):
+        """Returns the compiler and linker flags of the profile as
+        VAR=value assignments, for configure and the binding build."""
+        flags = ' '.join(JF_PROFILES[self.profile])
+        if not flags:
+            return []
+        assignments = ['CFLAGS=' + flags, 'CXXFLAGS=' + flags]
+        if '-flto' in flags:
+            assignments.append('LDFLAGS=-flto')
+        return assignments
+
+    def write_build_info(self):
+        """Records the jellyfish version and profile in the package, where
+        `pyjellyfish.build_info` reads them."""
+        with open(BUILD_INFO_FILE, 'w') as fh:
+            fh.write(
+                '# generated by `setup.py jellyfish`\n'
+                'BUILD_INFO = %r\n' % {
+                    'jellyfish_version': self.version,
+                    'profile': self.profile,
+                    'flags': JF_PROFILES[self.profile],
+                    'platform': sys.platform,
+                }
+            )
+
+    def artifact_key(self):
+        """Returns what the compiled artifacts depend on.
+
+        Profiles tuned to the building CPU are keyed on the target that
+        -march=native resolves to, so that a shared cache never hands
+        their binaries to another CPU; the key is None when the compiler
+        cannot report it."""
+        key = {
+            'jellyfish_version': self.version,
+            'profile': self.profile,
+            'flags': self.flags(),
+            'compiler': compiler_output('--version'),
+            'python_abi': sysconfig.get_config_var('EXT_SUFFIX'),
+            'platform': sysconfig.get_platform(),
+        }
+        if '-march=native' in JF_PROFILES[self.profile]:
+            target = compiler_output('-march=native', '-Q', '--help=target')
+            if target is None:
+                return None
+            key['native_target'] = hashlib.sha256(
+                target.encode()
+            ).hexdigest()
+        return key
+
+    def artifact_dir(self):
+        """Returns the directory of the artifact cache for this build, or
+        None when caching is disabled."""
+        key = self.artifact_key()
+        if not JF_CACHE_DIR or key is None:
+            return None
+        key = json.dumps(key, sort_keys=True)
+        return os.path.join(
+            JF_CACHE_DIR,
+            'jellyfish-%s-%s' % (
+                self.version, hashlib.sha256(key.encode()).hexdigest()[:16]
+            )
+        )
+
+    @staticmethod
+    def artifacts():
+        """Returns the paths of the files produced by a build, relative to
+        the source directory. Their rpaths are relative, so they can be
+        copied from one checkout to another."""
+        return (
+            ['dna_jellyfish.py', os.path.join('bin', 'jellyfish')]
+            + glob('_dna_jellyfish*')
+            + glob(os.path.join('pyjellyfish', '.*libs', 'libjellyfish*'))
+        )
+
+    def restore_artifacts(self, artifact_dir):
+        with open(os.path.join(artifact_dir, 'artifacts.json')) as fh:
+            paths = json.load(fh)['artifacts']
+        for path in paths:
+            self.mkpath(os.path.dirname(path) or '.')
+            self.copy_file(os.path.join(artifact_dir, path), path)
+
+    def store_artifacts(self, artifact_dir):
+        """Copies the artifacts to the cache, in a temporary directory
+        renamed in place so that concurrent builds never see a partial
+        entry."""
+        self.mkpath(JF_CACHE_DIR)
+        tmp_dir = tempfile.mkdtemp(dir=JF_CACHE_DIR)
+        try:
+            os.chmod(tmp_dir, 0o755)
+            paths = self.artifacts()
+            for path in paths:
+                self.mkpath(os.path.join(tmp_dir, os.path.dirname(path)))
+                self.copy_file(path, os.path.join(tmp_dir, path))
+            with open(os.path.join(tmp_dir, 'artifacts.json'), 'w') as fh:
+                json.dump(
+                    {'key': self.artifact_key(), 'artifacts': paths},
+                    fh, indent=2
+                )
+            if os.path.isdir(artifact_dir):
+                shutil.rmtree(artifact_dir)
+            os.rename(tmp_dir, artifact_dir)
+        except OSError as e:
+            self.warn('cannot cache jellyfish artifacts: %s' % e)
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
 
     def run(self):
+        artifact_dir = self.artifact_dir()
+        if (artifact_dir is not None and not self.rebuild and
+                os.path.isfile(os.path.join(artifact_dir, 'artifacts.json'))):
+            self.announce(
+                '%s\nReusing jellyfish v%s (%s profile) from %s\n%s'
+                % ('*'*40, self.version, self.profile, artifact_dir, '*'*40),
+                level=INFO
+            )
+            self.restore_artifacts(artifact_dir)
+            self.write_build_info()
+            return
+
+        self.build()
+        if artifact_dir is not None:
+            self.store_artifacts(artifact_dir)
+
+    def build(self):
         self.announce(
-            '%s\nInstalling jellyfish v%s\n%s' %('*'*40, self.version, '*'*40),
+            '%s\nInstalling jellyfish v%s (%s profile)\n%s'
+            % ('*'*40, self.version, self.profile, '*'*40),
             level=INFO
         )
 
@@ -203,7 +395,7 @@ class JellyfishCommand(SuperCommand):
         safe_extract_tarfile(jf_tarball, "./jf/build")
 
         self.spawn(
-            ['./configure', '--prefix', prefix],
+            ['./configure', '--prefix', prefix] + self.flags(),
             #['./configure', '--prefix', prefix, '--enable-python-binding'],
             # --enable-python-binding will install jellyfish.py in addition
             # to dna_jellyfish module without passing through pip which
@@ -215,7 +407,7 @@ class JellyfishCommand(SuperCommand):
         )
 
         self.spawn(
-            ['make', '-j', '8'],
+            ['make', '-j', str(os.cpu_count() or 1)],
             cwd=os.path.join(build_dir, dir_name)
         )
 
@@ -228,6 +420,7 @@ class JellyfishCommand(SuperCommand):
             [
                 'env',
                 'PKG_CONFIG_PATH=' + _pkg_config_path,
+            ] + self.flags() + [
                 sys.executable, '-m', 'pip',
                 'install',
                 '.',
@@ -253,6 +446,8 @@ class JellyfishCommand(SuperCommand):
 
         self.copy_file('./jf/bin/jellyfish', './bin/jellyfish')
 
+        self.write_build_info()
+
         if sys.platform == 'linux':
             self.mkpath('pyjellyfish/.libs')
 
@@ -410,11 +605,24 @@ class BDistWheelCommand(bdist_wheel):
         'jf-version=',
         None,
         'jellyfish version [2.2.10, 2.3.0] (default: 2.3.0)'
+    ), (
+        'jf-profile=',
+        None,
+        'jellyfish optimization profile [%s] (default: default)'
+        % ', '.join(JF_PROFILES)
+    ), (
+        'jf-rebuild',
+        None,
+        'build jellyfish even if it is in the artifact cache'
     )]
 
+    boolean_options = bdist_wheel.boolean_options + ['jf-rebuild']
+
     def initialize_options(self):
         super().initialize_options()
         self.jf_version = None
+        self.jf_profile = None
+        self.jf_rebuild = False
 
 
 class BuildScriptsCommand(build_scripts):
@@ -0,0 +1,81 @@
+import os
+import shutil
+import subprocess
+
+import numpy as np
+import pytest
+
+pytest.importorskip('dna_jellyfish')
+
+ROOT = os.path.join(os.path.dirname(__file__), os.pardir)
+K = 21
+GENOME_LEN = 5000
+DEPTH = 10
+READ_LEN = 100
+
+
+def find_jellyfish():
+    bundled = os.path.join(ROOT, 'bin', 'jellyfish')
+    if os.path.isfile(bundled):
+        return os.path.abspath(bundled)
+    return shutil.which('jellyfish')
+
+
+@pytest.fixture(scope='session')
+def genome():
+    rng = np.random.default_rng(0)
+    return np.frombuffer(b'ACGT', dtype=np.uint8)[
+        rng.integers(0, 4, GENOME_LEN)
+    ].tobytes().decode()
+
+
+@pytest.fixture(scope='session')
+def reads(genome, tmp_path_factory):
+    """FASTA of reads sampled from both strands of `genome`."""
+    rng = np.random.default_rng(1)
+    path = str(tmp_path_factory.mktemp('reads') / 'reads.fa')
+    complement = str.maketrans('ACGT', 'TGCA')
+    n = GENOME_LEN * DEPTH // READ_LEN
+    with open(path, 'w') as fh:
+        for i, start in enumerate(
+                rng.integers(0, GENOME_LEN - READ_LEN, n).tolist()):
+            read = genome[start:start + READ_LEN]
+            if i % 2:
+                read = read.translate(complement)[::-1]
+            fh.write('>r%d\n%s\n' % (i, read))
+    return path
+
+
+def count(reads, output, k=K, canonical=True, text=False):
+    jellyfish = find_jellyfish()
+    if jellyfish is None:
+        pytest.skip('jellyfish executable not found')
+    subprocess.run(
+        [jellyfish, 'count', '-m', str(k), '-s', '1M', '-o', output]
+        + (['-C'] if canonical else []) + (['--text'] if text else [])
+        + [reads],
+        check=True
+    )
+    return output
+
+
+@pytest.fixture(scope='session')
+def canonical_db(reads, tmp_path_factory):
+    """Database of the canonical 21-mers of `reads` (counted with -C)."""
+    return count(reads, str(tmp_path_factory.mktemp('db') / 'c21.jf'))
+
+
+@pytest.fixture(scope='session')
+def forward_db(reads, tmp_path_factory):
+    """Database of the 21-mers of `reads` as read (counted without -C)."""
+    return count(
+        reads, str(tmp_path_factory.mktemp('db') / 'n21.jf'), canonical=False
+    )
+
+
+@pytest.fixture(scope='session')
+def text_db(reads, tmp_path_factory):
+    """Database of the canonical 21-mers of `reads` in text format."""
+    return count(
+        reads, str(tmp_path_factory.mktemp('db') / 't21.jf'), text=True
+    )
@@ -0,0 +1,435 @@
+import gc
+import json
+import os
+import pickle
+import shutil
+import socket
+import sqlite3
+import subprocess
+import sys
+import time
+import weakref
+
+import numpy as np
+import pytest
+
+import conftest
+from conftest import K
+from pyjellyfish import (
+    Jellyfish, JellyfishClient, JellyfishCollection, count, diff
+)
+from pyjellyfish.BloomFilter import BloomFilter
+from pyjellyfish.fastx import read_fastx
+from pyjellyfish.Kmer import Kmer, encode
+from pyjellyfish.kmers import pack, pack_kmers, unpack
+from pyjellyfish.PersistentCache import PersistentCache
+from pyjellyfish.SolidIndex import SolidIndex
+
+
+def test_coverage(canonical_db, genome):
+    db = Jellyfish(canonical_db)
+    seq = genome[1000:1200] + 'NN' + genome[2000:2200]
+    counts = db.coverage(seq)
+    assert len(counts) == len(seq) - K + 1
+    for i, n in enumerate(counts.tolist()):
+        kmer = seq[i:i + K]
+        if 'N' in kmer:
+            assert n == 0
+        else:
+            assert n == db.query(kmer) > 0
+
+
+def test_bloom_filter(canonical_db, text_db, genome):
+    db = Jellyfish(canonical_db, bloom_fpr=0.01)
+    kmers = [genome[i:i + K] for i in range(0, 4000, 7)] + ['ACGT' * 5 + 'A']
+    expected = Jellyfish(canonical_db).query_many(kmers)
+    assert (db.query_many(kmers) == expected).all()
+    assert [db.query(s) for s in kmers] == expected.tolist()
+    # text databases are read with ReadMerFile
+    assert (BloomFilter.build(text_db).bits == db.bloom.bits).all()
+
+
+def test_index(canonical_db, text_db, genome, tmp_path):
+    db = Jellyfish(canonical_db)
+    kmers = [genome[i:i + K] for i in range(0, 4000, 7)]
+    expected = db.query_many(kmers)
+    for source in (canonical_db, text_db):
+        output = str(tmp_path / 'db.jfi')
+        SolidIndex.build(source, output, min_count=2)
+        index = Jellyfish(output)
+        assert (
+            index.query_many(kmers) == np.where(expected >= 2, expected, 0)
+        ).all()
+
+
+def test_count(canonical_db, reads, genome, tmp_path):
+    output = str(tmp_path / 'counted.jfi')
+    counted = count(reads, K, output=output)
+    kmers = [genome[i:i + K] for i in range(0, 4000, 7)]
+    expected = Jellyfish(canonical_db).query_many(kmers)
+    assert (counted.query_many(kmers) == expected).all()
+    assert (Jellyfish(output).query_many(kmers) == expected).all()
+
+
+def test_count_threads(reads):
+    with pytest.raises(ValueError):
+        count(reads, K, threads=2)
+
+
+def test_histogram_text(canonical_db, text_db):
+    binary = Jellyfish(canonical_db)
+    text = Jellyfish(text_db)
+    assert (text.histogram(100) == binary.histogram(100)).all()
+    assert text.stats() == binary.stats()
+
+
+def test_diff_text(canonical_db, text_db):
+    assert sorted(diff(text_db, canonical_db, 1, 1000)) == sorted(
+        diff(canonical_db, canonical_db, 1, 1000)
+    )
+
+
+def test_sketch_text(canonical_db, text_db):
+    sketch = Jellyfish(text_db).sketch(100)
+    assert (sketch.hashes == Jellyfish(canonical_db).sketch(100).hashes).all()
+
+
+def test_get_child(canonical_db, genome):
+    db = Jellyfish(canonical_db, n_cutoff=1)
+    seq = genome[1000:1000 + K]
+    assert db.get_child(seq) == [genome[1001:1001 + K]]
+    assert db.get_child(seq, forward=False) == [genome[999:999 + K]]
+    assert db.get_child(seq) == [
+        str(x) for x in db.get_child(Kmer.from_str(seq))
+    ]
+
+
+def test_collection_processes(canonical_db, forward_db, genome):
+    collection = JellyfishCollection([canonical_db, forward_db])
+    kmers = [genome[i:i + K] for i in range(1000, 1100)]
+    try:
+        expected = collection.query_many(kmers)
+        assert (collection.query_many(kmers, processes=2) == expected).all()
+        pool = collection._pool
+        assert (collection.query_many(kmers, processes=2) == expected).all()
+        assert collection._pool is pool
+    finally:
+        collection.close()
+    assert collection._pool is None
+
+
+@pytest.fixture
+def server(canonical_db, tmp_path):
+    path = str(tmp_path / 'db.sock')
+    process = subprocess.Popen([
+        sys.executable, '-m', 'pyjellyfish.serve', canonical_db,
+        '--socket', path, '--n-cutoff', '1'
+    ])
+    try:
+        for _ in range(100):
+            if os.path.exists(path):
+                break
+            time.sleep(0.1)
+        yield path
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def test_client(server, canonical_db, genome):
+    db = Jellyfish(canonical_db, n_cutoff=1)
+    seed = genome[1000:1000 + K]
+    with JellyfishClient(server) as client:
+        # the thresholds the server was started with apply by default
+        assert (client.cutoff, client.n_cutoff) == (db.cutoff, 1)
+        assert client.query(Kmer.from_str(seed)) == db.query(seed)
+        assert client.get_child(seed) == db.get_child(seed)
+        assert (
+            client.get_child(Kmer.from_str(seed))
+            == db.get_child(Kmer.from_str(seed))
+        )
+        assert client.extend(seed, max_len=200) == db.extend(
+            seed, max_len=200
+        )
+        assert client.explore([seed], max_nodes=50) == db.explore(
+            [seed], max_nodes=50
+        )
+
+
+def test_serve_socket(server, canonical_db, tmp_path):
+    def serve(path):
+        return subprocess.run([
+            sys.executable, '-m', 'pyjellyfish.serve', canonical_db,
+            '--socket', path
+        ], stderr=subprocess.PIPE, timeout=60)
+
+    # neither another file nor the socket of a running server is removed
+    path = str(tmp_path / 'other')
+    with open(path, 'w') as f:
+        f.write('data')
+    assert serve(path).returncode != 0
+    with open(path) as f:
+        assert f.read() == 'data'
+    assert serve(server).returncode != 0
+    with JellyfishClient(server) as client:
+        assert client.k == K
+
+    # the socket left by a server that is gone is replaced
+    path = str(tmp_path / 'stale.sock')
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.bind(path)
+    sock.close()
+    process = subprocess.Popen([
+        sys.executable, '-m', 'pyjellyfish.serve', canonical_db,
+        '--socket', path
+    ])
+    try:
+        for _ in range(100):
+            try:
+                client = JellyfishClient(path)
+                break
+            except ConnectionRefusedError:
+                time.sleep(0.1)
+        with client:
+            assert client.k == K
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def test_diff_k(canonical_db, reads, tmp_path):
+    short = conftest.count(reads, str(tmp_path / 'c5.jf'), k=5)
+    with pytest.raises(ValueError):
+        diff(canonical_db, short)
+    # k-mers of k > 32 do not fit the codes of RawMerFile
+    long = conftest.count(reads, str(tmp_path / 'c33.jf'), k=33)
+    matches = list(diff(long, long, 1, 1000))
+    assert len(matches) == Jellyfish(long).stats().distinct
+    assert all(len(kmer) == 33 and a == b for kmer, a, b in matches)
+
+
+def test_persistent_cache_workers(canonical_db, genome, tmp_path):
+    path = str(tmp_path / 'cache.sqlite')
+    db = Jellyfish(canonical_db, persistent_cache=path)
+    kmers = [genome[i:i + K] for i in range(0, 4000, 3)]
+    expected = Jellyfish(canonical_db).query_many(kmers)
+    assert (db.parallel_query(kmers, 2, chunk_size=500) == expected).all()
+    rows = sqlite3.connect(path).execute(
+        'SELECT COUNT(*) FROM counts'
+    ).fetchone()[0]
+    assert rows == len(set(Kmer.from_str(s).canonical for s in kmers))
+    db.persistent.close()
+    db = Jellyfish(canonical_db, persistent_cache=path)
+    assert (db.query_many(kmers) == expected).all()
+    assert db.persistent.info().misses == 0
+
+
+def test_pack_kmers_lengths():
+    with pytest.raises(ValueError):
+        pack_kmers(['A' * 22, 'C' * 20], 21)
+    codes, valid = pack_kmers(['A' * 21, 'C' * 21], 21)
+    assert codes.tolist() == [0, encode('C' * 21)]
+
+
+def test_sketch_canonical(canonical_db, forward_db):
+    canonical = Jellyfish(canonical_db).sketch(200)
+    forward = Jellyfish(forward_db).sketch(200)
+    assert len(forward) == 200
+    assert canonical.jaccard(forward) == 1.0
+    assert (forward.counts == canonical.counts).all()
+
+
+def test_diff_replaced(canonical_db, reads, tmp_path):
+    b = str(tmp_path / 'b.jf')
+    shutil.copy(canonical_db, b)
+    subset = str(tmp_path / 'subset.fa')
+    with open(reads) as fh, open(subset, 'w') as out:
+        out.writelines(fh.readlines()[:200])
+    expected = sorted(diff(
+        canonical_db, conftest.count(subset, str(tmp_path / 's.jf')), 1, 0
+    ))
+    assert expected
+    for processes in (0, 2):
+        shutil.copy(canonical_db, b)
+        assert list(diff(canonical_db, b, 1, 0, processes=processes)) == []
+        os.replace(conftest.count(subset, str(tmp_path / 'new.jf')), b)
+        assert sorted(
+            diff(canonical_db, b, 1, 0, processes=processes)
+        ) == expected
+
+
+def test_annotate(canonical_db, reads):
+    db = Jellyfish(canonical_db, n_cutoff=12)
+    records = list(read_fastx(reads))[:50]
+    for processes in (0, 2):
+        annotations = list(
+            db.annotate(reads, chunk_size=16, processes=processes)
+        )[:50]
+        for (name, seq), annotation in zip(records, annotations):
+            counts = [
+                db.query(seq[i:i + K]) for i in range(len(seq) - K + 1)
+            ]
+            assert annotation == (
+                name, len(seq), len(counts), min(counts),
+                float(np.median(counts)), float(np.mean(counts)),
+                sum(c < 12 for c in counts) / len(counts)
+            )
+            assert type(annotation.low_fraction) is float
+
+
+def test_index_max_count(canonical_db, genome, tmp_path):
+    db = Jellyfish(canonical_db)
+    kmers = [genome[i:i + K] for i in range(0, 4000, 7)]
+    kmers += ['ACGT' * 5 + 'A']
+    output = str(tmp_path / 'db.jfi')
+    index = SolidIndex.build(canonical_db, output, min_count=3, max_count=12)
+    assert index.counts.dtype == np.uint8
+    expected = [
+        min(n, 12) if n >= 3 else 0 for n in map(db.query, kmers)
+    ]
+    indexed = Jellyfish(output)
+    assert [indexed.query(s) for s in kmers] == expected
+    assert indexed.query_many(kmers).tolist() == expected
+
+
+def test_query_cache(canonical_db, genome):
+    db = Jellyfish(canonical_db, cache_size=2)
+    plain = Jellyfish(canonical_db)
+    a, b, c = (genome[i:i + K] for i in (100, 200, 300))
+    for seq in (a, b, a, c, b):
+        assert db.query(seq) == plain.query(seq)
+    # c evicts b, a having been used since, and b then evicts a
+    assert db.cache_info() == (1, 4, 2, 2, 2)
+    assert db.query(c) == plain.query(c)
+    assert db.cache_info().hits == 2
+    db.cache_clear()
+    assert db.cache_info() == (0, 0, 0, 2, 0)
+
+
+def test_lazy_loading(canonical_db, genome):
+    seq = genome[100:100 + K]
+    db = Jellyfish(canonical_db)
+    assert db._jf is None and db.k == K
+    n = db.query(seq)
+    assert n > 0 and db._jf is not None
+    db.close()
+    assert db._jf is None
+    assert db.query(seq) == n
+    assert pickle.loads(pickle.dumps(db))._jf is None
+    db.close()
+    assert db.preload() is db and db._jf is not None
+
+
+def test_pack_kmers_round_trip(genome):
+    for k in (1, 21, 32):
+        kmers = [genome[i:i + k] for i in range(0, 1000, 13)]
+        codes, valid = pack_kmers(kmers + ['N' * k], k)
+        assert valid.tolist() == [True] * len(kmers) + [False]
+        assert codes[:-1].tolist() == [Kmer.from_str(s).fwd for s in kmers]
+        canonical, _ = pack_kmers(kmers, k, canonical=True)
+        assert canonical.tolist() == [
+            Kmer.from_str(s).canonical for s in kmers
+        ]
+        assert unpack(codes[:-1], k).astype(str).tolist() == kmers
+        seq = genome[:300]
+        codes, valid = pack(seq, k, canonical=True)
+        assert valid.all()
+        assert codes.tolist() == [
+            Kmer.from_str(seq[i:i + k]).canonical
+            for i in range(len(seq) - k + 1)
+        ]
+
+
+def test_persistent_cache_release(tmp_path):
+    path = str(tmp_path / 'cache.sqlite')
+    cache = PersistentCache(path)
+    cache.put('db', 1, 5)
+    ref = weakref.ref(cache)
+    del cache
+    gc.collect()
+    assert ref() is None
+    subprocess.run([
+        sys.executable, '-c',
+        'from pyjellyfish.PersistentCache import PersistentCache\n'
+        'cache = PersistentCache(%r)\n'
+        'cache.put("db", 2, 7)' % path
+    ], check=True)
+    cache = PersistentCache(path)
+    assert cache.get_many('db', [1, 2]) == {1: 5, 2: 7}
+    cache.close()
+    cache.close()
+
+
+def test_sidecars_rebuilt(canonical_db, tmp_path):
+    path = str(tmp_path / 'db.jf')
+    shutil.copy(canonical_db, path)
+    db = Jellyfish(path, bloom_fpr=0.01)
+    sketch = db.sketch(100)
+    for size in (100, 0):
+        for suffix in ('.bloom', '.sketch'):
+            with open(path + suffix, 'r+b') as fh:
+                fh.truncate(size)
+        db = Jellyfish(path, bloom_fpr=0.01)
+        assert db.bloom.nbits > 0
+        assert (db.sketch(100).hashes == sketch.hashes).all()
+    assert sorted(os.listdir(tmp_path)) == [
+        'db.jf', 'db.jf.bloom', 'db.jf.sketch'
+    ]
+
+
+def test_invalid_kmers(canonical_db, genome):
+    with pytest.raises(ValueError):
+        Kmer.from_str('ACGN')
+    with pytest.raises(ValueError):
+        Kmer.from_str('ACGT', 5)
+    seq = genome[1000:1000 + K]
+    with_n = seq[:10] + 'N' + seq[11:]
+    plain = Jellyfish(canonical_db, n_cutoff=1)
+    cached = Jellyfish(canonical_db, n_cutoff=1, cache_size=100)
+    for db in (plain, cached):
+        assert db.query(with_n) == 0
+        assert db.get_child(with_n) == []
+        assert db.get_child('N' + seq[1:]) == plain.get_child(seq)
+        with pytest.raises(IndexError):
+            db.query(seq[:-1])
+        with pytest.raises(IndexError):
+            db.get_child(seq[:-1])
+    with pytest.raises(IndexError):
+        cached.query(seq + 'A')
+
+
+def test_explore_max_len(canonical_db, genome):
+    db = Jellyfish(canonical_db, n_cutoff=1)
+    seed = genome[1000:1000 + K]
+    path = db.extend(seed, max_len=len(genome))
+    assert len(path.seq) > 1000
+    exploration = db.explore([seed])
+    assert exploration.paths[0] == path
+    exploration = db.explore([seed], max_len=200)
+    assert exploration.paths[0] == db.extend(seed, max_len=200)
+    exploration = db.explore([seed], max_nodes=50)
+    assert len(exploration.paths[0].seq) == K + 49
+
+
+def test_instrument_stages(canonical_db, forward_db, genome):
+    seqs = [genome[i:i + K] for i in range(100)]
+    db = Jellyfish(canonical_db, instrument=True)
+    db.query(seqs[0])
+    db.query_many(seqs)
+    db.get_child(seqs[0])
+    db.get_child(Kmer.from_str(seqs[0]))
+    methods = json.loads(db.report())['methods']
+    # one lookup, 100 in bulk and two times 4 children
+    for stage in 'MerDNA.set', 'MerDNA.canonicalize', 'QueryMerFile.get':
+        assert methods[stage]['calls'] == 109
+    assert 'method="MerDNA.canonicalize"' in db.report('prometheus')
+
+    db.instrument(False)
+    db.query_many(seqs)
+    assert json.loads(db.report())['methods'] == methods
+
+    db = Jellyfish(forward_db, canonical=False, instrument=True)
+    db.query_many(seqs)
+    methods = json.loads(db.report())['methods']
+    assert methods['QueryMerFile.get']['calls'] == 100
+    assert 'MerDNA.canonicalize' not in methods